@@ -0,0 +1,137 @@
+"""Throughput benchmark for flushing command invocations to ``logging.commands``.
+
+Compares :meth:`~ditto.db.tables.Commands.insert_many` with :meth:`~ditto.db.tables.Commands.copy_many` on a real
+database. Run it against a scratch database, the table is created if missing and truncated before every run.
+
+Usage::
+
+    python -m benchmarks.commands --dsn postgres://... --rows 100000 --batch-size 100 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+import asyncpg
+
+from ditto.db.tables import Commands
+
+EPOCH = datetime.datetime(2000, 1, 1)
+
+COMMANDS = ["help", "ping", "info", "time", "stats", "reminder", "emoji", "colour"]
+
+
+def generate_invokes(count: int, rng: random.Random) -> list[dict[str, Any]]:
+    return [
+        {
+            "message_id": index,
+            "guild_id": rng.randrange(1, 1000),
+            "channel_id": rng.randrange(1, 10_000),
+            "user_id": rng.randrange(1, 100_000),
+            "invoked_at": EPOCH + datetime.timedelta(seconds=index),
+            "prefix": "!",
+            "command": rng.choice(COMMANDS),
+            "failed": rng.random() < 0.05,
+        }
+        for index in range(count)
+    ]
+
+
+def add_conflicts(invokes: list[dict[str, Any]], fraction: float, batch_size: int, rng: random.Random) -> None:
+    # Repeat rows from earlier batches, as when a flush is retried after it was written but not acknowledged
+    for index in range(batch_size, len(invokes)):
+        if rng.random() < fraction:
+            invokes[index] = invokes[rng.randrange(index - index % batch_size)]
+
+
+async def flush_insert(connection: asyncpg.Connection, batch: list[dict[str, Any]]) -> None:
+    await Commands.insert_many(connection, None, *batch, ignore_on_conflict=True)  # type: ignore
+
+
+async def flush_copy(connection: asyncpg.Connection, batch: list[dict[str, Any]]) -> None:
+    await Commands.copy_many(connection, *batch)
+
+
+METHODS: dict[str, Callable[[asyncpg.Connection, list[dict[str, Any]]], Awaitable[None]]] = {
+    "insert": flush_insert,
+    "copy": flush_copy,
+}
+
+
+@dataclass
+class Result:
+    method: str
+    rows: int
+    batch_size: int
+    stored: int
+    wall: float
+
+    HEADER = f"{'method':<10}{'rows':>10}{'batch':>8}{'stored':>10}{'rows/s':>12}{'per batch':>12}{'wall':>9}"
+
+    def __str__(self) -> str:
+        batches = max(-(-self.rows // self.batch_size), 1)
+        return (
+            f"{self.method:<10}{self.rows:>10}{self.batch_size:>8}{self.stored:>10}"
+            f"{self.rows / self.wall:>12.0f}{self.wall / batches * 1000:>10.2f}ms{self.wall:>8.2f}s"
+        )
+
+
+async def run_method(connection: asyncpg.Connection, method: str, invokes: list[dict[str, Any]], batch_size: int) -> Result:
+    await connection.execute(f"TRUNCATE {Commands._name}")
+    flush = METHODS[method]
+
+    wall = time.perf_counter()
+    for start in range(0, len(invokes), batch_size):
+        await flush(connection, invokes[start : start + batch_size])
+    wall = time.perf_counter() - wall
+
+    stored = await connection.fetchval(f"SELECT COUNT(*) FROM {Commands._name}")
+    return Result(method, len(invokes), batch_size, stored, wall)
+
+
+async def run(args: argparse.Namespace) -> None:
+    connection = await asyncpg.connect(args.dsn)
+    try:
+        await Commands.create(connection, if_not_exists=True)
+
+        print(Result.HEADER)
+        for count in args.rows:
+            for batch_size in args.batch_sizes:
+                rng = random.Random(args.seed)
+                invokes = generate_invokes(count, rng)
+                add_conflicts(invokes, args.conflicts, batch_size, rng)
+
+                for method in args.methods:
+                    print(await run_method(connection, method, invokes, batch_size), flush=True)
+    finally:
+        await connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.commands", description="Benchmark flushing command invocations to the database."
+    )
+    parser.add_argument("--dsn", default=os.environ.get("POSTGRES_DSN"), help="defaults to $POSTGRES_DSN")
+    parser.add_argument("--method", nargs="+", choices=METHODS, default=list(METHODS), dest="methods")
+    parser.add_argument("--rows", nargs="+", type=int, default=[100_000], help="number of invocations per run")
+    parser.add_argument("--batch-size", nargs="+", type=int, default=[100, 1000], dest="batch_sizes", metavar="BATCH_SIZE")
+    parser.add_argument("--conflicts", type=float, default=0, help="fraction of rows repeated from earlier batches")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.dsn is None:
+        parser.error("a database is required, pass --dsn or set POSTGRES_DSN")
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
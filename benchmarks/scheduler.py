@@ -0,0 +1,548 @@
+"""Simulated clock benchmark for the event scheduler.
+
+Runs :class:`~ditto.db.scheduler.EventSchedulerMixin` against an in-process stand in for the events table, on an
+event loop whose clock jumps straight to the next timer whenever every task is idle. Hours of events run in seconds,
+and dispatch lag depends only on the scheduler and the simulated database latency, not on the machine running it.
+
+Usage::
+
+    python -m benchmarks.scheduler --events 10000 100000 --batch-size 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import bisect
+import datetime
+import functools
+import itertools
+import logging
+import math
+import random
+import selectors
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Callable, Coroutine, Iterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+from unittest import mock
+
+from ditto.config import BASE_DIR, CONFIG, update_config
+from ditto.db import scheduler
+
+T = TypeVar("T")
+
+
+EPOCH = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+EVENT_TYPE = "benchmark"
+
+
+class VirtualClockSelector(selectors.DefaultSelector):
+    """A selector which never blocks, instead moving the clock forward by however long it was asked to wait."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.time: float = 0
+
+    def select(self, timeout: float | None = None) -> list[tuple[selectors.SelectorKey, int]]:
+        if timeout is not None and timeout > 0:
+            self.time += timeout
+        return super().select(0)
+
+
+class VirtualClockEventLoop(asyncio.SelectorEventLoop):
+    def __init__(self) -> None:
+        self._clock = VirtualClockSelector()
+        super().__init__(self._clock)
+
+    def time(self) -> float:
+        return self._clock.time
+
+    def utcnow(self) -> datetime.datetime:
+        return EPOCH + datetime.timedelta(seconds=self._clock.time)
+
+
+class SortedKeys:
+    """Keys kept in ascending order, split into blocks so inserts and removals do not shift the whole list."""
+
+    def __init__(self, block_size: int = 1000) -> None:
+        self.block_size: int = block_size
+        self._blocks: list[list[Any]] = []
+        self._maxes: list[Any] = []
+        self._len: int = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        for block in self._blocks:
+            yield from block
+
+    def add(self, key: Any) -> None:
+        self._len += 1
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+            return
+
+        i = min(bisect.bisect_left(self._maxes, key), len(self._blocks) - 1)
+        block = self._blocks[i]
+        bisect.insort(block, key)
+        self._maxes[i] = block[-1]
+
+        if len(block) > 2 * self.block_size:
+            self._blocks[i : i + 1] = [block[: self.block_size], block[self.block_size :]]
+            self._maxes[i : i + 1] = [block[self.block_size - 1], block[-1]]
+
+    def remove(self, key: Any) -> None:
+        i = bisect.bisect_left(self._maxes, key)
+        block = self._blocks[i]
+        del block[bisect.bisect_left(block, key)]
+        self._len -= 1
+
+        if block:
+            self._maxes[i] = block[-1]
+        else:
+            del self._blocks[i], self._maxes[i]
+
+    def count_until(self, key: Any) -> int:
+        """Returns the number of keys less than or equal to key."""
+        i = bisect.bisect_right(self._maxes, key)
+        count = sum(len(block) for block in self._blocks[:i])
+        if i < len(self._blocks):
+            count += bisect.bisect_right(self._blocks[i], key)
+        return count
+
+
+def statement(func: Callable[..., T]) -> Callable[..., Coroutine[Any, Any, T]]:
+    @functools.wraps(func)
+    async def wrapper(self: FakeEvents, connection: FakeConnection, /, *args: Any, **kwargs: Any) -> T:
+        self.calls[func.__name__] += 1
+        await asyncio.sleep(self.latency)
+
+        start = time.process_time()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self.cpu_time += time.process_time() - start
+
+    return wrapper
+
+
+class FakeEvents:
+    """In-process stand in for the :class:`~ditto.db.tables.Events` table.
+
+    Each statement waits for the simulated round trip latency, and is counted, as is the CPU time spent running it.
+    """
+
+    id = "id"
+
+    def __init__(self, clock: Callable[[], datetime.datetime], latency: float) -> None:
+        self.clock: Callable[[], datetime.datetime] = clock
+        self.latency: float = latency
+        self.rows: dict[int, dict[str, Any]] = {}
+        self.keys: SortedKeys = SortedKeys()
+        self.recurring: set[int] = set()
+        self.ids: Iterator[int] = itertools.count(1)
+        self.calls: Counter[str] = Counter()
+        self.cpu_time: float = 0
+
+    def add(
+        self,
+        scheduled_for: datetime.datetime,
+        event_type: str,
+        data: dict[str, Any],
+        recurrence: dict[str, Any] | None = None,
+    ) -> int:
+        id = next(self.ids)
+        self.rows[id] = {
+            "id": id,
+            "created_at": self.clock(),
+            "scheduled_for": scheduled_for,
+            "event_type": event_type,
+            "data": data,
+            "leased_until": None,
+            "leased_by": None,
+            "recurrence": recurrence,
+        }
+        self.keys.add((scheduled_for, id))
+        if recurrence is not None:
+            self.recurring.add(id)
+        return id
+
+    def remove(self, id: int) -> dict[str, Any] | None:
+        row = self.rows.pop(id, None)
+        if row is not None:
+            self.keys.remove((row["scheduled_for"], id))
+            self.recurring.discard(id)
+        return row
+
+    def move(self, id: int, scheduled_for: datetime.datetime) -> None:
+        row = self.rows[id]
+        self.keys.remove((row["scheduled_for"], id))
+        row["scheduled_for"] = scheduled_for
+        self.keys.add((scheduled_for, id))
+
+    def due(self, now: datetime.datetime) -> Iterator[dict[str, Any]]:
+        for scheduled_for, id in self.keys:
+            if scheduled_for > now:
+                return
+            yield self.rows[id]
+
+    def matches(self, row: dict[str, Any], event_type: str, data: dict[str, Any]) -> bool:
+        return row["event_type"] == event_type and data["kwargs"].items() <= row["data"]["kwargs"].items()
+
+    @statement
+    def insert(
+        self,
+        *,
+        returning: Any,
+        scheduled_for: datetime.datetime,
+        event_type: str,
+        data: dict[str, Any],
+        recurrence: dict[str, Any] | None = None,
+    ) -> tuple[int]:
+        return (self.add(scheduled_for, event_type, data, recurrence),)
+
+    @statement
+    def claim(self, id: int) -> bool:
+        return self.remove(id) is not None
+
+    @statement
+    def fetch_matching(self, event_type: str, data: dict[str, Any]) -> list[dict[str, Any]]:
+        rows = [row for row in self.rows.values() if self.matches(row, event_type, data)]
+        return sorted(rows, key=lambda row: row["scheduled_for"])
+
+    @statement
+    def delete_matching(self, event_type: str, data: dict[str, Any]) -> list[dict[str, Any]]:
+        ids = [id for id, row in self.rows.items() if self.matches(row, event_type, data)]
+        return [self.remove(id) for id in ids]  # type: ignore
+
+    @statement
+    def delete_ids(self, ids: list[int]) -> list[dict[str, Any]]:
+        return [row for row in map(self.remove, ids) if row is not None]
+
+    @statement
+    def fetch_upcoming(self, until: datetime.datetime, limit: int) -> list[dict[str, Any]]:
+        return [dict(row) for row in itertools.islice(self.due(until), limit)]
+
+    @statement
+    def insert_events(self, records: list[tuple[datetime.datetime, str, dict[str, Any]]]) -> list[int]:
+        return [self.add(*record) for record in records]
+
+    @statement
+    def claim_due(self, now: datetime.datetime, limit: int) -> list[dict[str, Any]]:
+        rows = list(itertools.islice((row for row in self.due(now) if row["recurrence"] is None), limit + 1))
+        more = len(rows) > limit
+        return [{**self.remove(row["id"]), "more": more} for row in rows[:limit]]  # type: ignore
+
+    @statement
+    def lock_due_recurring(self, now: datetime.datetime, limit: int) -> list[dict[str, Any]]:
+        rows = sorted(
+            (self.rows[id] for id in self.recurring if self.rows[id]["scheduled_for"] <= now),
+            key=lambda row: row["scheduled_for"],
+        )
+        return [dict(row) for row in rows[:limit]]
+
+    @statement
+    def reschedule(self, events: list[tuple[int, datetime.datetime]], owner: str | None = None) -> None:
+        for id, scheduled_for in events:
+            row = self.rows.get(id)
+            if row is None or (owner is not None and row["leased_by"] != owner):
+                continue
+            self.move(id, scheduled_for)
+            row["leased_until"] = row["leased_by"] = None
+
+    @statement
+    def lease_due(self, now: datetime.datetime, limit: int, until: datetime.datetime, owner: str) -> list[dict[str, Any]]:
+        available = (row for row in self.due(now) if row["leased_until"] is None or row["leased_until"] <= now)
+        rows = list(itertools.islice(available, limit + 1))
+        more = len(rows) > limit
+        for row in rows[:limit]:
+            row["leased_until"] = until
+            row["leased_by"] = owner
+        return [{**row, "more": more} for row in rows[:limit]]
+
+    @statement
+    def count_due(self, now: datetime.datetime) -> int:
+        return self.keys.count_until((now, math.inf))
+
+    @statement
+    def acknowledge(self, ids: list[int], owner: str) -> None:
+        for id in ids:
+            row = self.rows.get(id)
+            if row is not None and row["leased_by"] == owner:
+                self.remove(id)
+
+    @statement
+    def notify(self, channel: str, payload: str) -> None:
+        pass
+
+
+class FakeConnection:
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        yield
+
+    async def add_listener(self, channel: str, callback: Callable[..., Any]) -> None:
+        pass
+
+    async def remove_listener(self, channel: str, callback: Callable[..., Any]) -> None:
+        pass
+
+    def add_termination_listener(self, callback: Callable[..., Any]) -> None:
+        pass
+
+    def remove_termination_listener(self, callback: Callable[..., Any]) -> None:
+        pass
+
+
+class FakeAcquire:
+    def __init__(self, pool: FakePool) -> None:
+        self.pool: FakePool = pool
+
+    async def _acquire(self) -> FakeConnection:
+        self.pool.acquired += 1
+        return self.pool.connection
+
+    def __await__(self):
+        return self._acquire().__await__()
+
+    async def __aenter__(self) -> FakeConnection:
+        return await self._acquire()
+
+    async def __aexit__(self, *args: Any) -> None:
+        pass
+
+
+class FakePool:
+    def __init__(self) -> None:
+        self.connection: FakeConnection = FakeConnection()
+        self.acquired: int = 0
+
+    def acquire(self) -> FakeAcquire:
+        return FakeAcquire(self)
+
+    async def release(self, connection: FakeConnection) -> None:
+        pass
+
+
+class _ClientBase:
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+    async def setup_hook(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class BenchmarkClient(scheduler.EventSchedulerMixin, _ClientBase):
+    """The minimum of a bot needed to run the scheduler, which records each event it is sent."""
+
+    def __init__(self, pool: FakePool, expected: int) -> None:
+        self.pool: FakePool = pool
+        self.log: logging.Logger = logging.getLogger(__name__)
+        self.expected: int = expected
+        self.received: Counter[int] = Counter()
+        self.done: asyncio.Event = asyncio.Event()
+        super().__init__()
+
+    def dispatch(self, event: str, /, *args: Any) -> None:
+        self.received[args[0]] += 1
+        if len(self.received) >= self.expected:
+            self.done.set()
+
+    async def wait_until_ready(self) -> None:
+        pass
+
+
+@dataclass
+class Scenario:
+    # Offsets in seconds from the start of events already stored, negative offsets are overdue
+    stored: list[float] = field(default_factory=list)
+    # Pairs of the offset an event is scheduled at, and the offset it is scheduled for
+    inserted: list[tuple[float, float]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.stored) + len(self.inserted)
+
+    @property
+    def end(self) -> float:
+        return max(itertools.chain(self.stored, (scheduled_for for _, scheduled_for in self.inserted)), default=0)
+
+
+def uniform(events: int, span: float, rng: random.Random) -> Scenario:
+    """Events spread evenly over the span."""
+    return Scenario(stored=[rng.uniform(0, span) for _ in range(events)])
+
+
+def bursty(events: int, span: float, rng: random.Random, burst_size: int = 1000) -> Scenario:
+    """Events scheduled in bursts for (almost) the same moment."""
+    stored = []
+    while len(stored) < events:
+        burst = rng.uniform(0, span)
+        stored.extend(burst + rng.uniform(0, 0.01) for _ in range(min(burst_size, events - len(stored))))
+    return Scenario(stored=stored)
+
+
+def catch_up(events: int, span: float, rng: random.Random) -> Scenario:
+    """Events which all came due while the bot was offline."""
+    return Scenario(stored=[rng.uniform(-span, 0) for _ in range(events)])
+
+
+def out_of_order(events: int, span: float, rng: random.Random) -> Scenario:
+    """Events scheduled while running, each for a random time, so later events are often due first."""
+    inserted = []
+    for _ in range(events):
+        at = rng.uniform(0, span)
+        inserted.append((at, at + rng.uniform(1, span)))
+    return Scenario(inserted=sorted(inserted))
+
+
+SCENARIOS: dict[str, Callable[[int, float, random.Random], Scenario]] = {
+    "uniform": uniform,
+    "bursty": bursty,
+    "catch_up": catch_up,
+    "out_of_order": out_of_order,
+}
+
+
+@dataclass
+class Result:
+    scenario: str
+    events: int
+    dispatched: int
+    duplicates: int
+    lag_p50: float
+    lag_p99: float
+    lag_max: float
+    statements: float
+    acquires: float
+    cpu: float
+    wall: float
+
+    HEADER = (
+        f"{'scenario':<14}{'events':>10}{'dispatched':>12}{'dupes':>7}{'p50 lag':>10}{'p99 lag':>10}{'max lag':>10}"
+        f"{'stmts/ev':>10}{'conns/ev':>10}{'cpu/ev':>10}{'wall':>9}"
+    )
+
+    @property
+    def failed(self) -> bool:
+        # Every event must be dispatched exactly once
+        return self.dispatched < self.events or self.duplicates > 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.scenario:<14}{self.events:>10}{self.dispatched:>12}{self.duplicates:>7}"
+            f"{self.lag_p50:>9.3f}s{self.lag_p99:>9.3f}s{self.lag_max:>9.3f}s"
+            f"{self.statements:>10.3f}{self.acquires:>10.3f}{self.cpu * 1e6:>8.1f}us{self.wall:>8.2f}s"
+        )
+
+
+async def run_scenario(name: str, scenario: Scenario, latency: float) -> Result:
+    loop = asyncio.get_running_loop()
+    assert isinstance(loop, VirtualClockEventLoop)
+
+    events = FakeEvents(loop.utcnow, latency)
+    for index, offset in enumerate(scenario.stored):
+        events.add(loop.utcnow() + datetime.timedelta(seconds=offset), EVENT_TYPE, {"args": [index], "kwargs": {}})
+
+    pool = FakePool()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+
+    with mock.patch.object(scheduler, "Events", events), mock.patch.object(scheduler, "_utcnow", loop.utcnow):
+        client = BenchmarkClient(pool, len(scenario))
+
+        async def schedule() -> None:
+            for index, (at, offset) in enumerate(scenario.inserted, start=len(scenario.stored)):
+                await asyncio.sleep(at - loop.time())
+                await client.schedule_event(EPOCH + datetime.timedelta(seconds=offset), EVENT_TYPE, index)
+
+        await client.setup_hook()
+        inserter = asyncio.create_task(schedule())
+        try:
+            # Give up long after the last event was due, in case the scheduler has lost some
+            await asyncio.wait_for(client.done.wait(), scenario.end + CONFIG.SCHEDULER.LOOKAHEAD + 60)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            inserter.cancel()
+            client._dispatch_task.cancel()
+            client._ephemeral_dispatch_task.cancel()
+            running = [
+                task for task in (client._dispatch_task.get_task(), client._ephemeral_dispatch_task.get_task()) if task
+            ]
+            await asyncio.gather(inserter, *running, return_exceptions=True)
+            await client.close()
+
+    cpu = time.process_time() - cpu - events.cpu_time
+    wall = time.perf_counter() - wall
+
+    total = max(len(scenario), 1)
+    lag = client.scheduler_stats.lag
+    return Result(
+        scenario=name,
+        events=len(scenario),
+        dispatched=len(client.received),
+        duplicates=sum(client.received.values()) - len(client.received),
+        lag_p50=lag.quantile(0.5),
+        lag_p99=lag.quantile(0.99),
+        lag_max=max(lag.max, 0),
+        statements=sum(events.calls.values()) / total,
+        acquires=pool.acquired / total,
+        cpu=cpu / total,
+        wall=wall,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.scheduler", description="Benchmark the event scheduler against a simulated clock."
+    )
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS), dest="scenarios")
+    parser.add_argument("--events", nargs="+", type=int, default=[10_000], help="number of events per run")
+    parser.add_argument("--rate", type=float, default=50, help="average events due per second")
+    parser.add_argument("--latency", type=float, default=0.001, help="simulated database round trip in seconds")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--lease", type=float, default=None, help="lease duration in seconds")
+    parser.add_argument("--window-size", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    update_config(CONFIG, BASE_DIR / "res/config.yml")
+    CONFIG.DATABASE.DISABLED = False
+    CONFIG.SCHEDULER.BATCH_SIZE = args.batch_size
+    CONFIG.SCHEDULER.LEASE_DURATION = args.lease
+    if args.window_size is not None:
+        CONFIG.SCHEDULER.WINDOW_SIZE = args.window_size
+
+    # CPU is per event dispatched, excluding time spent in the simulated database
+    print(Result.HEADER)
+    failed = 0
+    for name in args.scenarios:
+        for count in args.events:
+            scenario = SCENARIOS[name](count, count / args.rate, random.Random(args.seed))
+
+            loop = VirtualClockEventLoop()
+            try:
+                result = loop.run_until_complete(run_scenario(name, scenario, args.latency))
+            finally:
+                loop.close()
+
+            print(result, flush=True)
+            failed += result.failed
+
+    if failed:
+        parser.exit(1, f"{failed} runs lost or duplicated events.\n")
+
+
+if __name__ == "__main__":
+    main()
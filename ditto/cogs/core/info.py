@@ -2,13 +2,13 @@ from __future__ import annotations
 
 import datetime
 import inspect
+import io
 import pathlib
 from typing import Any
 
 import discord
 import jishaku
 from discord.ext import commands
-from PIL import Image
 
 import ditto
 
@@ -25,7 +25,7 @@ from ...types import (
 )
 from ...utils.collections import summarise_list
 from ...utils.files import get_base_dir
-from ...utils.images import to_bytes
+from ...utils.images import solid_colour
 from ...utils.interactions import error
 from ...utils.slash import with_cog
 from ...utils.strings import as_columns, codeblock, yes_no
@@ -608,7 +608,7 @@ class Info(Cog):
         colour = colour or discord.Colour.random()
 
         size = (COLOUR_INFO_IMAGE_SIZE, COLOUR_INFO_IMAGE_SIZE)
-        image = to_bytes(Image.new("RGB", size, colour.to_rgb()))
+        image = io.BytesIO(await self.bot.executor.run(solid_colour, size, colour.to_rgb()))
         filename = f"{colour.value:0>6x}.png"
 
         embed = self._colour_info(colour, filename)
@@ -777,7 +777,7 @@ class Get(discord.app_commands.Group):
             return await error(interaction, f"Could not find colour for value: {value}")
 
         size = (COLOUR_INFO_IMAGE_SIZE, COLOUR_INFO_IMAGE_SIZE)
-        image = to_bytes(Image.new("RGB", size, colour.to_rgb()))
+        image = io.BytesIO(await self.client.executor.run(solid_colour, size, colour.to_rgb()))
         filename = f"{colour.value:0>6x}.png"
 
         embed = Info._colour_info(colour, filename)
@@ -8,8 +8,10 @@ import discord
 from discord.ext import commands, menus, tasks
 
 from ... import CONFIG, BotBase, Cog, Context
-from ...db.tables import Commands
+from ...db import InstrumentedPool, maintain_commands
+from ...db.tables import Commands, CommandUsage, CommandUsageUsers
 from ...utils.paginator import EmbedPaginator
+from ...utils.strings import codeblock
 from ...utils.time import human_friendly_timestamp
 
 
@@ -37,10 +39,15 @@ class Stats(Cog, hidden=True):
         self._socket_stats: Counter[str | None] = Counter()
         self._batch_lock = asyncio.Lock()
         self._batch_data: list[CommandInvoke] = []
+        self._users_pruned_at: datetime.datetime | None = None
 
         self.bulk_insert_task.add_exception_type(asyncpg.exceptions.PostgresConnectionError)
         self.bulk_insert_task.start()
 
+        if CONFIG.COMMAND_LOG.PARTITION_INTERVAL is not None or CONFIG.COMMAND_LOG.RETENTION is not None:
+            self.maintain_commands_task.add_exception_type(asyncpg.exceptions.PostgresConnectionError)
+            self.maintain_commands_task.start()
+
     async def cog_check(self, ctx: Context) -> bool:
         return await commands.is_owner().predicate(ctx)
 
@@ -51,7 +58,7 @@ class Stats(Cog, hidden=True):
         embed.set_author(name="Command History:", icon_url=ctx.me.display_avatar.url)
 
         async with self.bot.pool.acquire() as connection:
-            commands = await Commands.fetch(connection, order_by=(Commands.invoked_at, "DESC"), limit=100)
+            commands = await Commands.fetch_recent(connection, 100)
 
         if commands:
             for command in commands:
@@ -83,6 +90,46 @@ class Stats(Cog, hidden=True):
 
         await ctx.send(embed=embed)
 
+    @commands.command()
+    async def command_usage(self, ctx: Context, days: int = 7, guild: discord.Guild | None = None) -> None:
+        """Displays the most used commands over the past days, optionally in a single guild."""
+        since = discord.utils.utcnow() - datetime.timedelta(days=days)
+        async with self.bot.pool.acquire() as connection:
+            usage = await CommandUsage.fetch_top(connection, since, guild_id=getattr(guild, "id", None), limit=25)
+
+        embed = discord.Embed(
+            colour=ctx.me.colour,
+            description=(
+                f"Processed {sum(record['invocations'] for record in usage)} invokes of the top commands "
+                f"in the past {days} days."
+            ),
+        ).set_author(name=f"{guild or ctx.me.name} command usage:", icon_url=ctx.me.display_avatar.url)
+
+        for record in usage:
+            embed.add_field(
+                name=f"`{record['command']}`", value=f"{record['invocations']} ({record['failures']} failed)", inline=True
+            )
+
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    async def command_activity(self, ctx: Context, command: str | None = None, days: int = 14) -> None:
+        """Displays daily command invokes over the past days, optionally of a single command."""
+        since = discord.utils.utcnow() - datetime.timedelta(days=days)
+        async with self.bot.pool.acquire() as connection:
+            activity = await CommandUsage.fetch_daily(connection, since, command=command)
+
+        # Only the most recent days fit in an embed
+        lines = [
+            f"{record['day']:%Y-%m-%d} {record['invocations']:>8} {record['failures']:>8}" for record in activity[-120:]
+        ]
+        embed = discord.Embed(
+            colour=ctx.me.colour,
+            description=codeblock("\n".join([f"{'day':<10} {'invokes':>8} {'failed':>8}", *lines])),
+        ).set_author(name=f"{ctx.me.name} {command or 'command'} activity:", icon_url=ctx.me.display_avatar.url)
+
+        await ctx.send(embed=embed)
+
     @commands.command()
     async def socket_stats(self, ctx: Context) -> None:
         """Displays basic information about socket statistics."""
@@ -99,6 +146,135 @@ class Stats(Cog, hidden=True):
 
         await ctx.send(embed=embed)
 
+    @commands.command()
+    async def scheduler_stats(self, ctx: Context) -> None:
+        """Displays event scheduler dispatch latency and queue statistics."""
+        stats = await self.bot.fetch_scheduler_stats()
+        total_dispatched = sum(stats.dispatched.values())
+
+        embed = discord.Embed(
+            colour=ctx.me.colour,
+            description=(
+                f"Dispatched {total_dispatched} scheduled events, "
+                f"{stats.pending} pending in memory and {stats.backlog} overdue."
+            ),
+        ).set_author(name=f"{ctx.me.name} scheduler stats:", icon_url=ctx.me.display_avatar.url)
+
+        lag = stats.lag
+        embed.add_field(
+            name="Dispatch Lag:",
+            value=(
+                f"p50: {lag.quantile(0.5):.3f}s\np95: {lag.quantile(0.95):.3f}s\n"
+                f"p99: {lag.quantile(0.99):.3f}s\nmax: {max(lag.max, 0):.3f}s"
+            ),
+        )
+
+        claim_time = stats.claim_time
+        embed.add_field(
+            name="Claim DB Time:",
+            value=(
+                f"mean: {claim_time.mean * 1000:.2f}ms\np95: {claim_time.quantile(0.95) * 1000:.2f}ms\n"
+                f"claims: {claim_time.count}"
+            ),
+        )
+
+        for event_type, occurunces in stats.dispatched.most_common(22):
+            embed.add_field(name=f"`{event_type}`", value=str(occurunces), inline=True)
+
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    async def executor_stats(self, ctx: Context) -> None:
+        """Displays CPU executor pool size, queue depth and run time statistics."""
+        executor = self.bot.executor
+
+        embed = discord.Embed(
+            colour=ctx.me.colour,
+            description=(
+                f"Completed {executor.completed} calls in a {'process' if executor.uses_processes else 'thread'} pool "
+                f"of {executor.workers} workers."
+            ),
+        ).set_author(name=f"{ctx.me.name} executor stats:", icon_url=ctx.me.display_avatar.url)
+
+        embed.add_field(
+            name="Queue:",
+            value=(
+                f"running: {executor.running}/{executor.workers}\nqueued: {executor.queued}\n"
+                f"max queued: {executor.max_queued}"
+            ),
+        )
+
+        run_time = executor.run_time
+        embed.add_field(
+            name="Run Time:",
+            value=(
+                f"mean: {run_time.mean * 1000:.2f}ms\np95: {run_time.quantile(0.95) * 1000:.2f}ms\n"
+                f"max: {max(run_time.max, 0) * 1000:.2f}ms"
+            ),
+        )
+
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    async def query_stats(self, ctx: Context) -> None:
+        """Displays database pool usage, the slowest statements and recent slow queries."""
+        pool = self.bot.pool
+        if not isinstance(pool, InstrumentedPool):
+            await ctx.send("Database instrumentation is disabled.")
+            return
+
+        stats = pool.stats
+        embed = EmbedPaginator[discord.Embed](colour=ctx.me.colour, max_fields=10)
+        embed.set_author(name=f"{ctx.me.name} query stats:", icon_url=ctx.me.display_avatar.url)
+
+        wait = stats.acquire_wait
+        embed.add_field(
+            name="Pool:",
+            value=f"in use: {pool.in_use}\nidle: {pool.idle}\nmax: {pool.get_max_size()}",
+        )
+        embed.add_field(
+            name="Acquire Wait:",
+            value=(
+                f"p50: {wait.quantile(0.5) * 1000:.2f}ms\np95: {wait.quantile(0.95) * 1000:.2f}ms\n"
+                f"max: {max(wait.max, 0) * 1000:.2f}ms"
+            ),
+        )
+
+        for query, query_stats in stats.slowest(10):
+            latency = query_stats.latency
+            embed.add_field(
+                name=f"{latency.count} calls, {latency.total:.2f}s total, {query_stats.errors} errors",
+                value=f"mean: {latency.mean * 1000:.2f}ms p95: {latency.quantile(0.95) * 1000:.2f}ms\n`{query[:900]}`",
+                inline=False,
+            )
+
+        for slow_query in reversed(stats.slow_queries):
+            embed.add_field(
+                name=f"Slow query @ {human_friendly_timestamp(slow_query.executed_at)}: {slow_query.elapsed:.3f}s",
+                value=f"`{slow_query.query[:900]}`" + (f"\nfailed: {slow_query.error}" if slow_query.error else ""),
+                inline=False,
+            )
+
+        await menus.MenuPages(embed, delete_message_after=True).start(ctx)
+
+    @commands.command()
+    async def emoji_stats(self, ctx: Context) -> None:
+        """Displays emoji cache size, hit rate and eviction statistics."""
+        stats = self.bot.emoji_cache_stats
+
+        embed = discord.Embed(
+            colour=ctx.me.colour,
+            description=f"Holding {stats.size}/{CONFIG.EMOJI.CACHE_SIZE} emojis, evicted by the `{stats.policy}` policy.",
+        ).set_author(name=f"{ctx.me.name} emoji cache stats:", icon_url=ctx.me.display_avatar.url)
+
+        embed.add_field(
+            name="Lookups:",
+            value=f"hits: {stats.hits}\nmisses: {stats.misses}\nhit rate: {stats.hit_rate:.1%}",
+        )
+        embed.add_field(name="Evictions:", value=str(stats.evictions))
+
+        await ctx.send(embed=embed)
+
     @commands.Cog.listener()
     async def on_socket_response(self, msg: dict[str, Any]):
         self._socket_stats[msg.get("t")] += 1
@@ -134,13 +310,34 @@ class Stats(Cog, hidden=True):
         async with self._batch_lock:
             if self._batch_data:
                 async with self.bot.pool.acquire() as connection:
-                    await Commands.insert_many(connection, None, *self._batch_data)  # type: ignore
+                    # Only invocations not already logged are added to the rollup, so a retried flush is not counted twice
+                    async with connection.transaction():
+                        logged = await Commands.copy_many(connection, *self._batch_data)  # type: ignore
+                        await CommandUsage.record(connection, logged)
                     self._batch_data.clear()
 
+                    # Users counted towards past hours are no longer needed once those hours are complete
+                    now = discord.utils.utcnow()
+                    if self._users_pruned_at is None or now - self._users_pruned_at >= datetime.timedelta(hours=1):
+                        await CommandUsageUsers.delete_before(connection, now - datetime.timedelta(hours=2))
+                        self._users_pruned_at = now
+
     @bulk_insert_task.before_loop
     async def before_bulk_insert_task(self):
         await self.bot.wait_until_ready()
 
+    @tasks.loop(hours=1)
+    async def maintain_commands_task(self) -> None:
+        async with self.bot.pool.acquire() as connection:
+            created, removed = await maintain_commands(connection)
+
+        if created or removed:
+            self.bot.log.info(f"Created {len(created)} and removed {len(removed)} logged command partitions.")
+
+    @maintain_commands_task.before_loop
+    async def before_maintain_commands_task(self):
+        await self.bot.wait_until_ready()
+
 
 async def setup(bot: BotBase):
     if CONFIG.DATABASE.DISABLED:
@@ -16,9 +16,11 @@ from discord.ext import commands
 from ..config import CONFIG, load_global_config
 from ..db import EmojiCacheMixin, EventSchedulerMixin, setup_database
 from ..types import CONVERTERS
+from ..utils.executors import CPUExecutor
 from ..utils.interactions import error
 from ..utils.logging import WebhookHandler
 from ..utils.strings import codeblock
+from ..utils.users import configure_avatar_cache
 from ..web import WebServerMixin
 from .cog import Cog
 from .context import Context
@@ -38,6 +40,7 @@ ONE_MEGABYTE = ONE_KILOBYTE * 1024
 class BotBase(commands.bot.BotBase, WebServerMixin, EmojiCacheMixin, EventSchedulerMixin, discord.Client):
     converters: dict[type[Any], Callable[..., Any]]
     pool: asyncpg.pool.Pool
+    executor: CPUExecutor
 
     cogs: dict[str, Cog]
     owner: discord.User | None
@@ -49,6 +52,17 @@ class BotBase(commands.bot.BotBase, WebServerMixin, EmojiCacheMixin, EventSchedu
 
         self.start_time = datetime.datetime.now(datetime.timezone.utc)
 
+        configure_avatar_cache(
+            CONFIG.AVATAR_CACHE.MAX_MEMORY * ONE_MEGABYTE,
+            CONFIG.AVATAR_CACHE.DIRECTORY,
+            CONFIG.AVATAR_CACHE.MAX_DISK * ONE_MEGABYTE,
+        )
+
+        # Pool for CPU bound work which would otherwise block the event loop
+        self.executor = CPUExecutor(
+            CONFIG.EXECUTOR.WORKERS, CONFIG.EXECUTOR.MAX_QUEUED, processes=CONFIG.EXECUTOR.USE_PROCESSES
+        )
+
         # Setup logging
         self.log = logging.getLogger(__name__)
         if CONFIG.LOGGING.LOG_LEVEL is not None:
@@ -262,9 +276,10 @@ class BotBase(commands.bot.BotBase, WebServerMixin, EmojiCacheMixin, EventSchedu
         super().run(CONFIG.BOT.TOKEN)
 
     async def close(self):
+        await super().close()
         if not CONFIG.DATABASE.DISABLED:
             await self.pool.close()
-        await super().close()
+        self.executor.shutdown()
 
 
 class Bot(BotBase, commands.Bot): ...
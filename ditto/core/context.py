@@ -47,9 +47,9 @@ class Context(commands.Context[BotT]):
         return user_in_guild(guild, self.author)
 
     async def get_timezone(self) -> zoneinfo.ZoneInfo | None:
-        cached_record = TimeZones.get_cached(user_id=self.author.id)
-        if cached_record is not None:
-            return zoneinfo.ZoneInfo(cached_record["time_zone"])
+        found, timezone = TimeZones.lookup(self.author.id)
+        if found:
+            return timezone
 
         async with self.db as connection:
             return await TimeZones.get_timezone(connection, self.author)
@@ -1,3 +1,4 @@
+import datetime
 from typing import Any, NoReturn
 
 import asyncpg
@@ -5,6 +6,7 @@ from discord.utils import MISSING
 from donphan import OPTIONAL_CODECS, MaybeAcquire, create_db, create_pool
 
 from .emoji import *
+from .pool import *
 from .scheduler import *
 from .tables import *
 
@@ -20,6 +22,32 @@ class NoDatabase(MaybeAcquire):
         raise RuntimeError("No database connection was setup.")
 
 
+async def maintain_commands(connection: asyncpg.Connection) -> tuple[list[str], list[str]]:
+    """Creates upcoming logged command partitions, and removes logged commands older than the retention.
+
+    Returns the names of the partitions created and removed, expired commands in an unpartitioned table are deleted.
+    """
+    # this is a hack because >circular imports<
+    from ..config import CONFIG
+
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    retention = datetime.timedelta(days=CONFIG.COMMAND_LOG.RETENTION) if CONFIG.COMMAND_LOG.RETENTION is not None else None
+
+    if CONFIG.COMMAND_LOG.PARTITION_INTERVAL is None:
+        if retention is not None:
+            await Commands.delete_before(connection, now - retention)
+        return [], []
+
+    return await Commands.maintain_partitions(
+        connection,
+        now,
+        datetime.timedelta(hours=CONFIG.COMMAND_LOG.PARTITION_INTERVAL),
+        CONFIG.COMMAND_LOG.PARTITIONS_AHEAD,
+        retention,
+        archive=CONFIG.COMMAND_LOG.ARCHIVE,
+    )
+
+
 async def setup_database() -> asyncpg.pool.Pool:
     # this is a hack because >circular imports<
     from ..config import CONFIG
@@ -35,8 +63,39 @@ async def setup_database() -> asyncpg.pool.Pool:
 
         dsn = f"postgres://{CONFIG.DATABASE.USERNAME}:{CONFIG.DATABASE.PASSWORD}@{CONFIG.DATABASE.HOSTNAME}/{CONFIG.DATABASE.DATABASE}"
 
+    stats = None
+    kwargs = {}
+    if CONFIG.DATABASE.INSTRUMENT:
+        stats = PoolStats(CONFIG.DATABASE.SLOW_QUERY_THRESHOLD, CONFIG.DATABASE.SLOW_QUERY_LOG_SIZE)
+        kwargs["setup"] = stats.setup_connection
+
     # Connect to the DB
-    pool = await create_pool(dsn, OPTIONAL_CODECS, server_settings={"application_name": CONFIG.APP_NAME})
+    pool = await create_pool(dsn, OPTIONAL_CODECS, server_settings={"application_name": CONFIG.APP_NAME}, **kwargs)
     async with pool.acquire() as connection:
+        if CONFIG.SCHEDULER.PARTITION_INTERVAL is not None:
+            await Events.create_partitioned(connection)
+        if CONFIG.COMMAND_LOG.PARTITION_INTERVAL is not None:
+            await Commands.create_partitioned(connection)
+        await Events.migrate(connection)
+        await Emoji.migrate(connection)
+        await UserEmoji.migrate(connection)
         await create_db(connection, if_not_exists=True, with_transaction=False)
+        await Events.create_indexes(connection)
+        await Commands.create_indexes(connection)
+        await CommandUsage.backfill(connection)
+
+        if CONFIG.DATABASE.PRELOAD_TIMEZONES:
+            await TimeZones.preload(connection)
+
+        if CONFIG.SCHEDULER.PARTITION_INTERVAL is not None:
+            await Events.maintain_partitions(
+                connection,
+                datetime.datetime.now(tz=datetime.timezone.utc),
+                datetime.timedelta(hours=CONFIG.SCHEDULER.PARTITION_INTERVAL),
+                CONFIG.SCHEDULER.PARTITIONS_AHEAD,
+            )
+        await maintain_commands(connection)
+
+    if stats is not None:
+        return InstrumentedPool(pool, stats)  # type: ignore
     return pool
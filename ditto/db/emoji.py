@@ -1,17 +1,26 @@
 from __future__ import annotations
 
+import asyncio
 import datetime
+import hashlib
 import io
 import re
-from typing import TYPE_CHECKING, Any
+from collections.abc import Awaitable, Callable, Hashable, Sequence
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, TypeVar
 
 import asyncpg
 import discord
+from discord.ext import tasks
 from donphan import MaybeAcquire
-from PIL import Image, ImageChops, ImageDraw
 
 from ..config import CONFIG
 from ..types import User
+from ..utils.collections import SizedLRUDict
+from ..utils.eviction import EVICTION_POLICIES, EvictionPolicy, LFUPolicy
+from ..utils.executors import CPUExecutor
+from ..utils.images import mask_circle, mask_circle_animated
 from ..utils.users import download_avatar
 from .tables import Emoji, UserEmoji
 
@@ -19,33 +28,50 @@ if TYPE_CHECKING:
     from ..core.bot import BotBase
 
 
-__all__ = ("EmojiCacheMixin",)
+__all__ = ("EmojiCacheStats", "EmojiCacheMixin")
 
 
-async def create_user_image(user: User) -> tuple[io.BytesIO, str]:
-    avatar = Image.open(await download_avatar(user, size=128, static=True))
+T = TypeVar("T")
 
-    if avatar.mode != "RGBA":
-        avatar = avatar.convert("RGBA")
 
-    # Apply circular mask to image
-    _, _, _, alpha = avatar.split()
-    if alpha.mode != "L":
-        alpha = alpha.convert("L")
+# Largest image Discord accepts for an emoji
+MAX_EMOJI_SIZE = 256 * 1024
 
-    mask = Image.new("L", avatar.size)
-    draw = ImageDraw.Draw(mask)
-    draw.ellipse((0, 0) + avatar.size, fill=255)
 
-    mask = ImageChops.darker(mask, alpha)
-    avatar.putalpha(mask)
+async def create_user_image(user: User, executor: CPUExecutor, *, animated: bool = False) -> tuple[io.BytesIO, str]:
+    image = None
+    if animated and user.display_avatar.is_animated():
+        avatar = await download_avatar(user, size=128, format="gif")
+        try:
+            image = await executor.run(
+                mask_circle_animated, avatar.getvalue(), MAX_EMOJI_SIZE, CONFIG.EMOJI.ANIMATED_MAX_FRAMES
+            )
+        except ValueError:
+            pass
 
-    # Save to FP
-    out_fp = io.BytesIO()
-    avatar.save(out_fp, format="png")
-    out_fp.seek(0)
+    if image is None:
+        avatar = await download_avatar(user, size=128, static=True)
 
-    return out_fp, user.display_avatar.key
+        # Apply circular mask to image
+        image = await executor.run(mask_circle, avatar.getvalue())
+
+    # Keyed by content so identical avatars share an emoji
+    return io.BytesIO(image), hashlib.sha256(image).hexdigest()
+
+
+@dataclass
+class EmojiCacheStats:
+    policy: str
+    size: int = 0
+    # Emojis served from the cache, and those which had to be created
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
 
 
 class EmojiCacheMixin:
@@ -58,26 +84,275 @@ class EmojiCacheMixin:
             raise ValueError("Emoji cache size must be greater than 0.")
         if CONFIG.EMOJI.CACHE_SIZE > 1000:
             raise ValueError("Emoji cache size must be less than 1000.")
+        if CONFIG.EMOJI.EVICTION_BATCH < 1:
+            raise ValueError("Emoji eviction batch must be greater than 0.")
+
+        policy = CONFIG.EMOJI.EVICTION_POLICY
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Emoji eviction policy must be one of: {', '.join(EVICTION_POLICIES)}.")
+        if policy == LFUPolicy.name:
+            self.__emoji_cache__policy: EvictionPolicy[int] = LFUPolicy(CONFIG.EMOJI.LFU_HALF_LIFE)
+        else:
+            self.__emoji_cache__policy = EVICTION_POLICIES[policy]()
+        self.__emoji_cache__stats: EmojiCacheStats = EmojiCacheStats(policy)
+
+        # Number of emojis in the cache, including those being created
+        self.__emoji_cache__count: int | None = None
+        self.__emoji_cache__lock: asyncio.Lock = asyncio.Lock()
+
+        # Application emojis in the cache, loaded when reconciled at startup and as they are fetched or created
+        self.__emoji_cache__emojis: dict[int, discord.Emoji] = {}
+
+        # When each emoji was last fetched since the last flush to the database
+        self.__emoji_cache__fetched: dict[int, datetime.datetime] = {}
+
+        if CONFIG.EMOJI.ANIMATED_MAX_FRAMES < 1:
+            raise ValueError("Emoji animated max frames must be greater than 0.")
+
+        # Processed avatars by avatar key, so recreating an evicted emoji does not process its avatar again
+        self.__emoji_cache__images: SizedLRUDict[tuple[str, bool], bytes] = SizedLRUDict(
+            CONFIG.EMOJI.IMAGE_CACHE_SIZE * 1024 * 1024
+        )
+
+        # Fetches in progress, so concurrent fetches of the same emoji or user share a single result
+        self.__emoji_cache__emoji_flights: dict[int, asyncio.Future[discord.Emoji]] = {}
+        self.__emoji_cache__user_flights: dict[tuple[int, str], asyncio.Future[discord.Emoji]] = {}
+
+        if CONFIG.EMOJI.MAX_CONCURRENT_CREATES < 1:
+            raise ValueError("Emoji max concurrent creates must be greater than 0.")
+
+        if CONFIG.EMOJI.FLUSH_INTERVAL <= 0:
+            raise ValueError("Emoji flush interval must be greater than 0.")
+        self._emoji_flush_task.change_interval(seconds=CONFIG.EMOJI.FLUSH_INTERVAL)
+        self._emoji_flush_task.add_exception_type(asyncpg.exceptions.PostgresConnectionError)
+
+    async def setup_hook(self) -> None:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        if not CONFIG.DATABASE.DISABLED:
+            async with self.pool.acquire() as connection:
+                try:
+                    await self.__reconcile_emojis(connection)
+                except discord.HTTPException:
+                    self.log.exception("Failed to reconcile the emoji cache with the application's emojis.")
+                    self.__emoji_cache__count = await Emoji.count(connection)
+
+                # Seed the eviction policy with the existing emojis, from least to most recently used
+                for record in sorted(await Emoji.fetch(connection), key=lambda record: record["last_fetched"]):
+                    self.__emoji_cache__policy.insert(record["emoji_id"])
+            self._emoji_flush_task.start()
+
+        await super().setup_hook()  # type: ignore
+
+    async def close(self) -> None:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        if self._emoji_flush_task.is_running():
+            self._emoji_flush_task.cancel()
+            async with self.pool.acquire() as connection:
+                await self.__flush_last_fetched(connection)
+
+        await super().close()  # type: ignore
+
+    @property
+    def emoji_cache_stats(self) -> EmojiCacheStats:
+        """:class:`EmojiCacheStats`: Hit, miss and eviction counts of the emoji cache."""
+        stats = self.__emoji_cache__stats
+        stats.size = self.__emoji_cache__count or 0
+        return stats
+
+    async def __reconcile_emojis(self, connection: asyncpg.Connection) -> None:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        self.__emoji_cache__emojis = {emoji.id: emoji for emoji in await self.fetch_application_emojis()}
+        cached = {record["emoji_id"] for record in await Emoji.fetch(connection)}
+
+        # Drop rows whose emoji has been deleted
+        stale = cached - self.__emoji_cache__emojis.keys()
+        if stale:
+            await Emoji.delete_ids(connection, list(stale))
+        cached -= stale
+
+        # Delete emojis whose rows have been deleted, other than the emoji used when an emoji is not found
+        orphaned = []
+        if CONFIG.EMOJI.DELETE_ORPHANED:
+            not_found = getattr(self._not_found_emoji, "id", None)
+            orphaned = [id for id in self.__emoji_cache__emojis if id not in cached and id != not_found]
+            await asyncio.gather(*(self.__delete_application_emoji(id) for id in orphaned))
+
+        self.__emoji_cache__emojis = {id: emoji for id, emoji in self.__emoji_cache__emojis.items() if id in cached}
+        self.__emoji_cache__count = len(cached)
+
+        if stale or orphaned:
+            self.log.info(
+                f"Reconciled the emoji cache, dropped {len(stale)} stale rows and {len(orphaned)} orphaned emojis."
+            )
+
+    async def __get_emoji(self, emoji_id: int) -> discord.Emoji | None:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        # Emojis created by other processes since startup are not in the snapshot taken when reconciling
+        emoji = self.__emoji_cache__emojis.get(emoji_id)
+        if emoji is not None:
+            return emoji
+
+        try:
+            emoji = self.get_emoji(emoji_id) or await self.fetch_application_emoji(emoji_id)
+        except discord.NotFound:
+            return None
+
+        self.__emoji_cache__emojis[emoji_id] = emoji
+        return emoji
+
+    async def __single_flight(
+        self, flights: dict[Any, asyncio.Future[T]], key: Hashable, func: Callable[[], Awaitable[T]]
+    ) -> T:
+        while (future := flights.get(key)) is not None:
+            # Waiting does not raise if the fetch was cancelled, in which case it is retried here
+            await asyncio.wait((future,))
+            if not future.cancelled():
+                return future.result()
+
+        future = asyncio.get_running_loop().create_future()
+        flights[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Only raised to those waiting, if any
+            future.exception()
+            raise
+        finally:
+            del flights[key]
+
+        future.set_result(result)
+        return result
+
+    def __touch_emoji(self, emoji_id: int) -> None:
+        # Written to the database on the next flush
+        self.__emoji_cache__fetched[emoji_id] = datetime.datetime.now(datetime.timezone.utc)
+        self.__emoji_cache__policy.access(emoji_id)
+        self.__emoji_cache__stats.hits += 1
+
+    def __forget_emoji(self, emoji_id: int) -> None:
+        self.__emoji_cache__fetched.pop(emoji_id, None)
+        self.__emoji_cache__policy.remove(emoji_id)
+
+    async def __flush_last_fetched(self, connection: asyncpg.Connection) -> None:
+        if not self.__emoji_cache__fetched:
+            return
+
+        fetched, self.__emoji_cache__fetched = self.__emoji_cache__fetched, {}
+        try:
+            await Emoji.update_last_fetched(connection, fetched)
+        except BaseException:
+            # Keep the unwritten times for the next flush, unless the emoji has been fetched again since
+            self.__emoji_cache__fetched = fetched | self.__emoji_cache__fetched
+            raise
+
+    @tasks.loop(seconds=60)
+    async def _emoji_flush_task(self) -> None:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        async with self.pool.acquire() as connection:
+            await self.__flush_last_fetched(connection)
+
+    async def __reserve_emoji(self, connection: asyncpg.Connection) -> list[int]:
+        async with self.__emoji_cache__lock:
+            if self.__emoji_cache__count is None:
+                self.__emoji_cache__count = await Emoji.count(connection)
+
+            # Evict emojis in the order chosen by the eviction policy if the cache is full
+            evicted = []
+            overflow = self.__emoji_cache__count + 1 - CONFIG.EMOJI.CACHE_SIZE
+            if overflow > 0:
+                # Recent fetches only held in memory must be written first so they are not evicted
+                await self.__flush_last_fetched(connection)
+                evicted = await Emoji.evict(
+                    connection, max(overflow, CONFIG.EMOJI.EVICTION_BATCH), self.__emoji_cache__policy.order()
+                )
+                self.__emoji_cache__count -= len(evicted)
+                self.__emoji_cache__stats.evictions += len(evicted)
+                for emoji_id in evicted:
+                    self.__forget_emoji(emoji_id)
+
+                # The count has drifted if fewer rows than expected were left to evict
+                if len(evicted) < overflow:
+                    self.__emoji_cache__count = await Emoji.count(connection)
+
+            self.__emoji_cache__count += 1
+
+        return evicted
+
+    def __release_emoji(self) -> None:
+        if self.__emoji_cache__count is not None:
+            self.__emoji_cache__count -= 1
+
+    async def __delete_application_emoji(self, emoji_id: int) -> None:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        emoji = await self.__get_emoji(emoji_id)
+        self.__emoji_cache__emojis.pop(emoji_id, None)
+
+        if emoji is not None:
+            with suppress(discord.NotFound):
+                await emoji.delete()
 
     async def create_emoji(
-        self, name: str, image: io.BytesIO, *, connection: asyncpg.Connection | None = None
+        self,
+        name: str,
+        image: io.BytesIO,
+        *,
+        image_key: str | None = None,
+        connection: asyncpg.Connection | None = None,
     ) -> discord.Emoji:
         if TYPE_CHECKING:
             assert isinstance(self, BotBase)
         async with MaybeAcquire(connection, pool=self.pool) as connection:
+            evicted = await self.__reserve_emoji(connection)
 
-            # Delete the oldest emojis if the cache is full
-            while await Emoji.count(connection) >= CONFIG.EMOJI.CACHE_SIZE:
-                record = await Emoji.fetch_row(connection, order_by=(Emoji.last_fetched, "ASC"))
-                if record is None:
-                    raise RuntimeError("Emoji cache simultaneously empty and full.")
-                await self.delete_emoji(record["emoji_id"], connection=connection)
+            try:
+                # The evicted rows are already gone, so their emojis can be deleted alongside creating the new one
+                emoji, *_ = await asyncio.gather(
+                    self.create_application_emoji(name=name, image=image.read()),
+                    *(self.__delete_application_emoji(emoji_id) for emoji_id in evicted),
+                )
+                self.__emoji_cache__emojis[emoji.id] = emoji
+                try:
+                    await Emoji.insert(connection, emoji_id=emoji.id, image_key=image_key)
+                except asyncpg.UniqueViolationError:
+                    # An emoji was created for the same image meanwhile
+                    await self.__delete_application_emoji(emoji.id)
+                    raise
+                self.__emoji_cache__policy.insert(emoji.id)
+                self.__emoji_cache__stats.misses += 1
+            except BaseException:
+                self.__release_emoji()
+                raise
 
-            emoji = await self.create_application_emoji(name=name, image=image.read())
+        return emoji
 
-            await Emoji.insert(connection, emoji_id=emoji.id)
+    async def __create_user_image(self, user: User) -> tuple[io.BytesIO, str]:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
 
-        return emoji
+        key = (user.display_avatar.key, CONFIG.EMOJI.ANIMATED)
+        if key in self.__emoji_cache__images:
+            image = self.__emoji_cache__images[key]
+            return io.BytesIO(image), hashlib.sha256(image).hexdigest()
+
+        image_fp, image_key = await create_user_image(user, self.executor, animated=CONFIG.EMOJI.ANIMATED)
+        self.__emoji_cache__images[key] = image_fp.getvalue()
+        return image_fp, image_key
 
     async def create_user_emoji(self, user: User, *, connection: asyncpg.Connection | None = None) -> discord.Emoji:
         if TYPE_CHECKING:
@@ -91,64 +366,140 @@ class EmojiCacheMixin:
         else:
             name = re.sub(r"[^A-Za-z0-9_]", "", user.name)[:28] + user.discriminator
 
-        image, hash = await create_user_image(user)
+        # Default avatars are shared by many users, so their emoji can be looked up without downloading them
+        image = None
+        if user.avatar is None:
+            image_key = f"default:{user.display_avatar.key}"
+        else:
+            image, image_key = await self.__create_user_image(user)
 
         async with MaybeAcquire(connection, pool=self.pool) as connection:
-            emoji = await self.create_emoji(name, image, connection=connection)
-            await UserEmoji.insert(connection, emoji_id=emoji.id, user_id=user.id, avatar_hash=hash)
+            emoji = await self.__fetch_image_emoji(image_key, connection)
+
+            if emoji is None:
+                if image is None:
+                    image, _ = await self.__create_user_image(user)
+
+                try:
+                    emoji = await self.create_emoji(name, image, image_key=image_key, connection=connection)
+                except asyncpg.UniqueViolationError:
+                    emoji = await self.__fetch_image_emoji(image_key, connection)
+                    if emoji is None:
+                        raise
+
+            await UserEmoji.insert(
+                connection,
+                update_on_conflict=(UserEmoji.emoji_id, UserEmoji.avatar_hash),
+                returning=None,
+                user_id=user.id,
+                emoji_id=emoji.id,
+                avatar_hash=user.display_avatar.key,
+            )
 
         return emoji
 
+    async def __fetch_image_emoji(self, image_key: str, connection: asyncpg.Connection) -> discord.Emoji | None:
+        record = await Emoji.fetch_row(connection, image_key=image_key)
+        if record is None:
+            return None
+
+        try:
+            return await self.fetch_emoji(record["emoji_id"], connection=connection)
+        except (ValueError, RuntimeError):
+            return None
+
     async def fetch_emoji(self, emoji_id: int | None, *, connection: asyncpg.Connection | None = None) -> discord.Emoji:
-        if TYPE_CHECKING:
-            assert isinstance(self, BotBase)
         if emoji_id is None:
             return self._not_found_emoji
 
+        return await self.__single_flight(
+            self.__emoji_cache__emoji_flights, emoji_id, lambda: self.__fetch_emoji(emoji_id, connection)
+        )
+
+    async def __fetch_emoji(self, emoji_id: int, connection: asyncpg.Connection | None) -> discord.Emoji:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
         async with MaybeAcquire(connection, pool=self.pool) as connection:
             record = await Emoji.fetch_row(connection, emoji_id=emoji_id)
             if record is None:
                 raise ValueError(f"Emoji with ID: {emoji_id} not in cache.")
 
-            await Emoji.update_record(connection, record, last_fetched=datetime.datetime.now(datetime.timezone.utc))  # type: ignore
-
-            emoji = None
-            try:
-                emoji = self.get_emoji(emoji_id) or await self.fetch_application_emoji(emoji_id)
-            except discord.NotFound:
-                pass
-
+            emoji = await self.__get_emoji(emoji_id)
             if emoji is None:
                 await Emoji.delete_record(connection, record)  # type: ignore
+                self.__forget_emoji(emoji_id)
+                self.__release_emoji()
                 raise RuntimeError("Emoji in cache was deleted.")
 
+            self.__touch_emoji(emoji_id)
+
         return emoji
 
     async def fetch_user_emoji(self, user: User | None, *, connection: asyncpg.Connection | None = None) -> discord.Emoji:
-        if TYPE_CHECKING:
-            assert isinstance(self, BotBase)
         if user is None:
             return await self.fetch_emoji(None, connection=connection)
 
         if isinstance(user, discord.Member):
             user = user._user
 
+        return await self.__single_flight(
+            self.__emoji_cache__user_flights,
+            (user.id, user.display_avatar.key),
+            lambda: self.__fetch_user_emoji(user, connection),  # type: ignore
+        )
+
+    async def __fetch_user_emoji(self, user: User, connection: asyncpg.Connection | None) -> discord.Emoji:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
         async with MaybeAcquire(connection, pool=self.pool) as connection:
             record = await UserEmoji.fetch_row(connection, user_id=user.id)
 
-            if record is not None:
-                if record["avatar_hash"] == user.display_avatar.key:
-                    try:
-                        return await self.fetch_emoji(record["emoji_id"], connection=connection)
-                    except RuntimeError:
-                        pass
-
-                    await UserEmoji.delete_record(connection, record)  # type: ignore
-                else:
-                    await self.delete_emoji(record["emoji_id"], connection=connection)
+            if record is not None and record["avatar_hash"] == user.display_avatar.key:
+                # The emoji may have been evicted, in which case a new one is created
+                try:
+                    return await self.fetch_emoji(record["emoji_id"], connection=connection)
+                except (ValueError, RuntimeError):
+                    pass
 
+            # The user's previous emoji may be shared, it is left to be evicted once no user refers to it
             return await self.create_user_emoji(user, connection=connection)
 
+    async def fetch_user_emojis(
+        self, users: Sequence[User | None], *, connection: asyncpg.Connection | None = None
+    ) -> list[discord.Emoji]:
+        """Fetches the emojis of many users at once, in the order the users were given.
+
+        Existing emojis are looked up in a single query, missing emojis are created concurrently.
+        """
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        users = [user._user if isinstance(user, discord.Member) else user for user in users]
+        unique = {user.id: user for user in users if user is not None}
+
+        async with MaybeAcquire(connection, pool=self.pool) as connection:
+            records = {record["user_id"]: record for record in await UserEmoji.fetch_users(connection, list(unique))}
+
+        semaphore = asyncio.Semaphore(CONFIG.EMOJI.MAX_CONCURRENT_CREATES)
+
+        async def resolve(user: User) -> discord.Emoji:
+            record = records.get(user.id)
+            if record is not None and record["avatar_hash"] == user.display_avatar.key:
+                emoji = self.__emoji_cache__emojis.get(record["emoji_id"])
+                if emoji is not None:
+                    self.__touch_emoji(emoji.id)
+                    return emoji
+
+            # Each call may need its own connection, so they are not made on the one given
+            async with semaphore:
+                return await self.fetch_user_emoji(user)
+
+        emojis = dict(zip(unique, await asyncio.gather(*(resolve(user) for user in unique.values()))))
+
+        return [emojis[user.id] if user is not None else self._not_found_emoji for user in users]
+
     async def delete_emoji(self, emoji_id: int, *, connection: asyncpg.Connection | None = None) -> None:
         if TYPE_CHECKING:
             assert isinstance(self, BotBase)
@@ -157,14 +508,8 @@ class EmojiCacheMixin:
             if record is None:
                 raise ValueError(f"Emoji with ID: {emoji_id} not in cache.")
 
-            emoji = self.get_emoji(emoji_id)
-            if emoji is not None:
-                await emoji.delete()
-            else:
-                try:
-                    emoji = await self.fetch_application_emoji(emoji_id)
-                    await emoji.delete()
-                except discord.NotFound:
-                    pass
+            await self.__delete_application_emoji(emoji_id)
 
             await Emoji.delete_record(connection, record)  # type: ignore
+            self.__forget_emoji(emoji_id)
+            self.__release_emoji()
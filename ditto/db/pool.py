@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import collections
+import datetime
+import functools
+import logging
+import re
+from collections.abc import Generator
+from dataclasses import dataclass, field
+from time import perf_counter
+from types import TracebackType
+from typing import Any
+
+import asyncpg
+from asyncpg.pool import PoolAcquireContext
+
+from ..utils.metrics import Histogram
+
+__all__ = ("normalise_query", "QueryStats", "SlowQuery", "PoolStats", "InstrumentedPool")
+
+
+log = logging.getLogger(__name__)
+
+
+WHITESPACE = re.compile(r"\s+")
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w$.])\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|\$\d+)(?:\s*,\s*(?:\?|\$\d+))+\s*\)")
+
+# Statements beyond this many are grouped together, so generated SQL can not grow the stats without bound
+MAX_STATEMENTS = 500
+OTHER_STATEMENTS = "<other>"
+
+
+@functools.lru_cache(maxsize=1024)
+def normalise_query(query: str) -> str:
+    """Reduces a query to its shape, so the same statement with different literals is grouped together."""
+    query = WHITESPACE.sub(" ", query).strip()
+    query = STRING_LITERAL.sub("?", query)
+    query = NUMBER_LITERAL.sub("?", query)
+    return PLACEHOLDER_LIST.sub("(...)", query)
+
+
+@dataclass
+class QueryStats:
+    # Seconds each execution of the statement took
+    latency: Histogram = field(default_factory=lambda: Histogram.exponential(0.0005, 2, 16))
+    errors: int = 0
+
+
+@dataclass(frozen=True)
+class SlowQuery:
+    query: str
+    elapsed: float
+    executed_at: datetime.datetime
+    error: str | None = None
+
+
+class PoolStats:
+    def __init__(self, slow_query_threshold: float | None = None, slow_query_log_size: int = 50) -> None:
+        self.slow_query_threshold: float | None = slow_query_threshold
+
+        self.queries: dict[str, QueryStats] = {}
+        self.slow_queries: collections.deque[SlowQuery] = collections.deque(maxlen=slow_query_log_size)
+        # Seconds spent waiting for a connection from the pool
+        self.acquire_wait: Histogram = Histogram.exponential(0.0001, 2, 18)
+
+    def record_query(self, record: asyncpg.connection.LoggedQuery) -> None:
+        query = normalise_query(record.query)
+
+        stats = self.queries.get(query)
+        if stats is None:
+            if len(self.queries) >= MAX_STATEMENTS:
+                query = OTHER_STATEMENTS
+            stats = self.queries.setdefault(query, QueryStats())
+
+        stats.latency.observe(record.elapsed)
+        if record.exception is not None:
+            stats.errors += 1
+
+        if self.slow_query_threshold is not None and record.elapsed >= self.slow_query_threshold:
+            error = type(record.exception).__name__ if record.exception is not None else None
+            self.slow_queries.append(SlowQuery(query, record.elapsed, datetime.datetime.now(datetime.timezone.utc), error))
+            log.warning(f"Slow query took {record.elapsed:.3f}s: {query}")
+
+    async def setup_connection(self, connection: asyncpg.Connection) -> None:
+        # Loggers are held in a set, so adding the same one on every acquire is harmless
+        connection.add_query_logger(self.record_query)
+
+    def slowest(self, count: int) -> list[tuple[str, QueryStats]]:
+        """Returns the statements which have taken the most time in total."""
+        return sorted(self.queries.items(), key=lambda item: item[1].latency.total, reverse=True)[:count]
+
+
+class _InstrumentedAcquire:
+    def __init__(self, context: PoolAcquireContext, stats: PoolStats) -> None:
+        self._context: PoolAcquireContext = context
+        self._stats: PoolStats = stats
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        start = perf_counter()
+        try:
+            return await self._context.__aenter__()
+        finally:
+            self._stats.acquire_wait.observe(perf_counter() - start)
+
+    async def __aexit__(
+        self, exc_type: type[BaseException] | None, exc_val: BaseException | None, exc_tb: TracebackType | None
+    ) -> None:
+        await self._context.__aexit__(exc_type, exc_val, exc_tb)
+
+    async def _acquire(self) -> asyncpg.Connection:
+        start = perf_counter()
+        try:
+            return await self._context
+        finally:
+            self._stats.acquire_wait.observe(perf_counter() - start)
+
+    def __await__(self) -> Generator[Any, None, asyncpg.Connection]:
+        return self._acquire().__await__()
+
+
+class InstrumentedPool:
+    """Wraps a connection pool, recording how long each statement takes and how long connections are waited for.
+
+    The pool must have been created with :meth:`PoolStats.setup_connection` as its ``setup`` callback, anything
+    other than acquiring a connection is passed through to the pool.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, stats: PoolStats) -> None:
+        self._pool: asyncpg.Pool = pool
+        self.stats: PoolStats = stats
+
+    def acquire(self, *, timeout: float | None = None) -> _InstrumentedAcquire:
+        return _InstrumentedAcquire(self._pool.acquire(timeout=timeout), self.stats)
+
+    @property
+    def in_use(self) -> int:
+        return self._pool.get_size() - self._pool.get_idle_size()
+
+    @property
+    def idle(self) -> int:
+        return self._pool.get_idle_size()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
@@ -2,13 +2,23 @@ from __future__ import annotations
 
 import asyncio
 import datetime
-from dataclasses import dataclass
+import heapq
+import itertools
+import uuid
+import zoneinfo
+from collections import Counter
+from collections.abc import Coroutine, Iterable, Mapping, Sequence
+from contextlib import suppress
+from dataclasses import dataclass, field, replace
+from time import perf_counter
 from typing import TYPE_CHECKING, Any
 
 import asyncpg
 import discord
 from discord.ext import tasks
 
+from ..utils.collections import TimerWheel
+from ..utils.metrics import Histogram
 from .tables import Events
 
 if TYPE_CHECKING:
@@ -17,7 +27,95 @@ if TYPE_CHECKING:
     from ..core.bot import BotBase
 
 
-__all__ = ("ScheduledEvent", "EventSchedulerMixin")
+__all__ = ("Recurrence", "ScheduledEvent", "SchedulerStats", "EventSchedulerMixin")
+
+
+EventSpec = tuple[datetime.datetime, str, Sequence[Any], Mapping[str, Any]]
+
+
+EVENTS_CHANNEL = "core_events"
+
+
+def _utcnow() -> datetime.datetime:
+    # The scheduler's clock, benchmarks replace this to run against simulated time
+    return datetime.datetime.now(tz=datetime.timezone.utc)
+
+
+def _as_utc(time: datetime.datetime) -> datetime.datetime:
+    if time.tzinfo is None:
+        return time.replace(tzinfo=datetime.timezone.utc)
+    return time
+
+
+@dataclass(frozen=True)
+class Recurrence:
+    """How often a scheduled event repeats.
+
+    Either a fixed ``interval``, or a wall clock ``time`` in ``timezone`` on the given ``days`` of the week
+    (Monday is 0), defaulting to every day.
+    """
+
+    interval: datetime.timedelta | None = None
+    time: datetime.time | None = None
+    days: tuple[int, ...] | None = None
+    timezone: str = "UTC"
+
+    def __post_init__(self) -> None:
+        if (self.interval is None) == (self.time is None):
+            raise ValueError("A recurrence must have exactly one of an interval or a time.")
+        if self.interval is not None and self.interval <= datetime.timedelta(0):
+            raise ValueError("Recurrence interval must be greater than 0.")
+        if self.days is not None and (not self.days or any(day not in range(7) for day in self.days)):
+            raise ValueError("Recurrence days must be weekdays between 0 and 6.")
+        if self.time is not None and self.time.tzinfo is not None:
+            raise ValueError("Recurrence time must not have a timezone, set the recurrence's timezone instead.")
+
+        # Checked here, as an unknown zone would otherwise only fail once the event is dispatched
+        try:
+            zoneinfo.ZoneInfo(self.timezone)
+        except (ValueError, zoneinfo.ZoneInfoNotFoundError):
+            raise ValueError(f"Unknown recurrence timezone: {self.timezone}.") from None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Self:
+        return cls(
+            interval=datetime.timedelta(seconds=data["interval"]) if data.get("interval") is not None else None,
+            time=datetime.time.fromisoformat(data["time"]) if data.get("time") is not None else None,
+            days=tuple(data["days"]) if data.get("days") is not None else None,
+            timezone=data.get("timezone", "UTC"),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "interval": self.interval.total_seconds() if self.interval is not None else None,
+            "time": self.time.isoformat() if self.time is not None else None,
+            "days": list(self.days) if self.days is not None else None,
+            "timezone": self.timezone,
+        }
+
+    def next_after(self, previous: datetime.datetime, now: datetime.datetime) -> datetime.datetime:
+        """Returns the first occurrence after both the previous occurrence and now."""
+        after = max(previous, now)
+
+        # Intervals are counted from the previous occurrence so dispatch latency does not drift
+        if self.interval is not None:
+            missed = (after - previous) // self.interval
+            return previous + self.interval * (missed + 1)
+
+        assert self.time is not None
+
+        # Combining the wall clock time with the zone keeps the local time fixed across DST changes
+        tz = zoneinfo.ZoneInfo(self.timezone)
+        date = after.astimezone(tz).date()
+        for offset in range(8):
+            day = date + datetime.timedelta(days=offset)
+            if self.days is not None and day.weekday() not in self.days:
+                continue
+            occurrence = datetime.datetime.combine(day, self.time, tzinfo=tz)
+            if occurrence > after:
+                return occurrence.astimezone(datetime.timezone.utc)
+
+        raise RuntimeError("Could not find the next occurrence.")
 
 
 @dataclass
@@ -28,22 +126,47 @@ class ScheduledEvent:
     event_type: str
     args: list[Any]
     kwargs: dict[str, Any]
+    recurrence: Recurrence | None = None
 
     @classmethod
     def from_record(cls, record: asyncpg.Record) -> Self:
+        # Records fetched before the recurrence column was added do not have it
+        recurrence = record.get("recurrence")
         return cls(
             record["id"],
-            record["created_at"],
-            record["scheduled_for"],
+            _as_utc(record["created_at"]),
+            _as_utc(record["scheduled_for"]),
             record["event_type"],
             record["data"]["args"],
             record["data"]["kwargs"],
+            Recurrence.from_dict(recurrence) if recurrence is not None else None,
         )
 
+    def advance(self, now: datetime.datetime) -> Self:
+        assert self.recurrence is not None
+        return replace(self, scheduled_for=self.recurrence.next_after(self.scheduled_for, now))
+
     def dispatch(self, client: discord.Client) -> None:
         client.dispatch(self.event_type, *self.args, *self.kwargs)
 
 
+@dataclass
+class SchedulerStats:
+    # Seconds between when an event was scheduled for and when it was dispatched
+    lag: Histogram = field(default_factory=lambda: Histogram.exponential(0.001, 2, 20))
+    # Seconds spent in the database claiming due events
+    claim_time: Histogram = field(default_factory=lambda: Histogram.exponential(0.0005, 2, 16))
+    dispatched: Counter[str] = field(default_factory=Counter)
+    # Events held in memory, stored events loaded into the window and ephemeral events
+    pending: int = 0
+    # Stored events due but not yet dispatched, only counted by EventSchedulerMixin.fetch_scheduler_stats
+    backlog: int = 0
+
+    def record_dispatch(self, event: ScheduledEvent, now: datetime.datetime) -> None:
+        self.lag.observe(max((now - event.scheduled_for).total_seconds(), 0))
+        self.dispatched[event.event_type] += 1
+
+
 class EventSchedulerMixin:
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         # this is a hack because >circular imports<
@@ -51,31 +174,107 @@ class EventSchedulerMixin:
 
         super().__init__(*args, **kwargs)
 
+        self.__event_scheduler__listener: asyncpg.Connection | None = None
+        # Tasks started from notifications, held so they are not garbage collected before they finish
+        self.__event_scheduler__tasks: set[asyncio.Task[None]] = set()
+
+        # Min-heap of upcoming events, every stored event scheduled up to the window end is held here
+        self.__event_scheduler__condition: asyncio.Condition = asyncio.Condition()
+        self.__event_scheduler__heap: list[tuple[datetime.datetime, int, ScheduledEvent]] = []
+        # Sequence number of the live heap entry of each stored event
+        self.__event_scheduler__ids: dict[int, int] = {}
+        # Sequence numbers of discarded entries, which are skipped when they reach the top of the heap
+        self.__event_scheduler__tombstones: set[int] = set()
+        self.__event_scheduler__counter = itertools.count()
+        self.__event_scheduler__window: datetime.datetime | None = None
+        self.__event_scheduler__current: ScheduledEvent | None = None
+        self.__event_scheduler__last_batch: tuple[int, bool] = (0, False)
+        self.__event_scheduler__stats: SchedulerStats = SchedulerStats()
+
+        # Ephemeral events are only held in memory, so are available without a database
+        self.__event_scheduler__wheel: TimerWheel[ScheduledEvent] = TimerWheel(CONFIG.SCHEDULER.EPHEMERAL_RESOLUTION)
+        self.__event_scheduler__wheel_wakeup: asyncio.Event = asyncio.Event()
+
         if CONFIG.DATABASE.DISABLED:
             return
 
-        self.__event_scheduler__active: asyncio.Event = asyncio.Event()
-        self.__event_scheduler__current: ScheduledEvent | None = None
+        self.__event_scheduler__window_size: int = CONFIG.SCHEDULER.WINDOW_SIZE
+        self.__event_scheduler__lookahead = datetime.timedelta(seconds=CONFIG.SCHEDULER.LOOKAHEAD)
+        self.__event_scheduler__batch_size: int | None = CONFIG.SCHEDULER.BATCH_SIZE
+        self.__event_scheduler__lease: datetime.timedelta | None = None
+
+        if self.__event_scheduler__window_size < 1:
+            raise ValueError("Scheduler window size must be greater than 0.")
+        if self.__event_scheduler__batch_size is not None and self.__event_scheduler__batch_size < 1:
+            raise ValueError("Scheduler batch size must be greater than 0.")
+
+        if CONFIG.SCHEDULER.LEASE_DURATION is not None:
+            if CONFIG.SCHEDULER.LEASE_DURATION <= 0:
+                raise ValueError("Scheduler lease duration must be greater than 0.")
+            self.__event_scheduler__lease = datetime.timedelta(seconds=CONFIG.SCHEDULER.LEASE_DURATION)
+            self.__event_scheduler__batch_size = self.__event_scheduler__batch_size or 1
+
+        self.__event_scheduler__partition_interval: datetime.timedelta | None = None
+        self.__event_scheduler__partitions_ahead: int = CONFIG.SCHEDULER.PARTITIONS_AHEAD
+
+        if CONFIG.SCHEDULER.PARTITION_INTERVAL is not None:
+            if CONFIG.SCHEDULER.PARTITION_INTERVAL <= 0:
+                raise ValueError("Scheduler partition interval must be greater than 0.")
+            self.__event_scheduler__partition_interval = datetime.timedelta(hours=CONFIG.SCHEDULER.PARTITION_INTERVAL)
+
+        self.__event_scheduler__owner: str = uuid.uuid4().hex
         self._dispatch_task.add_exception_type(asyncpg.exceptions.PostgresConnectionError)
+        self._partition_task.add_exception_type(asyncpg.exceptions.PostgresConnectionError)
 
     async def setup_hook(self):
         # this is a hack because >circular imports<
         from ..config import CONFIG
 
+        self._ephemeral_dispatch_task.start()
         if not CONFIG.DATABASE.DISABLED:
+            if self.__event_scheduler__lease is not None:
+                await self.__listen()
             self._dispatch_task.start()
+            if self.__event_scheduler__partition_interval is not None:
+                self._partition_task.start()
         await super().setup_hook()  # type: ignore
 
-    async def schedule_event(self, time: datetime.datetime, type: str, /, *args: Any, **kwargs: Any) -> ScheduledEvent:
+    async def close(self):
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        if self.__event_scheduler__listener is not None:
+            listener, self.__event_scheduler__listener = self.__event_scheduler__listener, None
+            with suppress(asyncpg.exceptions.InterfaceError):
+                await listener.remove_listener(EVENTS_CHANNEL, self.__on_notify)
+                listener.remove_termination_listener(self.__on_listener_terminated)
+            await self.pool.release(listener)
+        await super().close()
+
+    async def schedule_event(
+        self,
+        time: datetime.datetime,
+        type: str,
+        /,
+        *args: Any,
+        recurrence: Recurrence | None = None,
+        ephemeral: bool = False,
+        **kwargs: Any,
+    ) -> ScheduledEvent:
         if TYPE_CHECKING:
             assert isinstance(self, BotBase)
 
-        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        now = _utcnow()
 
         if time < now:
             raise RuntimeError("Cannot schedule an event in the past.")
 
-        event = ScheduledEvent(None, now, time, type, list(args), dict(kwargs))
+        event = ScheduledEvent(None, now, time, type, list(args), dict(kwargs), recurrence)
+
+        # Ephemeral events are not persisted, and are lost if the bot restarts
+        if ephemeral:
+            self.__add_ephemeral_event(event, now)
+            return event
 
         async with self.pool.acquire() as connection:
             (event.id,) = await Events.insert(
@@ -84,53 +283,460 @@ class EventSchedulerMixin:
                 scheduled_for=time,
                 event_type=type,
                 data={"args": list(args), "kwargs": dict(kwargs)},
+                recurrence=recurrence.to_dict() if recurrence is not None else None,
             )
 
-        self.__event_scheduler__active.set()
+            # Wake any other processes sharing the events table
+            if self.__event_scheduler__lease is not None:
+                await Events.notify(connection, EVENTS_CHANNEL, f"{event.id} {time.isoformat()} {type}")
 
-        # Check if the new event is scheduled for before the current one
-        if self.__event_scheduler__current is not None and time < self.__event_scheduler__current.scheduled_for:
-            self.restart_scheduler()
+        await self.__wake_scheduler(event)
 
         return event
 
+    async def schedule_events(self, events: Iterable[EventSpec], /) -> list[ScheduledEvent]:
+        """Schedules many events at once.
+
+        Each event is given as a tuple of the time it is scheduled for, its type, args and kwargs.
+        """
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        now = _utcnow()
+
+        scheduled = [ScheduledEvent(None, now, time, type, list(args), dict(kwargs)) for time, type, args, kwargs in events]
+        if not scheduled:
+            return []
+
+        if any(event.scheduled_for < now for event in scheduled):
+            raise RuntimeError("Cannot schedule an event in the past.")
+
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                ids = await Events.insert_events(
+                    connection,
+                    [
+                        (event.scheduled_for, event.event_type, {"args": event.args, "kwargs": event.kwargs})
+                        for event in scheduled
+                    ],
+                )
+
+            for event, id in zip(scheduled, ids):
+                event.id = id
+
+            if self.__event_scheduler__lease is not None:
+                first = min(scheduled, key=lambda event: event.scheduled_for)
+                payload = f"{first.id} {first.scheduled_for.isoformat()} {first.event_type}"
+                await Events.notify(connection, EVENTS_CHANNEL, payload)
+
+        await self.__wake_scheduler(*scheduled)
+
+        return scheduled
+
+    async def find_events(self, type: str, /, **filters: Any) -> list[ScheduledEvent]:
+        """Fetches the pending events of a type whose kwargs contain the given values."""
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        async with self.pool.acquire() as connection:
+            records = await Events.fetch_matching(connection, type, {"kwargs": filters})
+
+        return [ScheduledEvent.from_record(record) for record in records]
+
+    async def cancel_event(self, id: int, /) -> ScheduledEvent | None:
+        """Cancels a pending event, returning it if it was found."""
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        async with self.pool.acquire() as connection:
+            records = await Events.delete_ids(connection, [id])
+
+        cancelled = await self.__forget_events(records)
+        return cancelled[0] if cancelled else None
+
+    async def cancel_events(self, type: str, /, **filters: Any) -> list[ScheduledEvent]:
+        """Cancels the pending events of a type whose kwargs contain the given values."""
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        async with self.pool.acquire() as connection:
+            records = await Events.delete_matching(connection, type, {"kwargs": filters})
+
+        return await self.__forget_events(records)
+
+    async def __forget_events(self, records: list[asyncpg.Record]) -> list[ScheduledEvent]:
+        events = [ScheduledEvent.from_record(record) for record in records]
+
+        if events:
+            # Wake the scheduler in case it is waiting on one of the cancelled events
+            async with self.__event_scheduler__condition:
+                self.__discard_events({event.id for event in events if event.id is not None})
+                self.__event_scheduler__condition.notify_all()
+
+        return events
+
     def restart_scheduler(self):
+        self.__event_scheduler__heap.clear()
+        self.__event_scheduler__ids.clear()
+        self.__event_scheduler__tombstones.clear()
+        self.__event_scheduler__window = None
         self._dispatch_task.restart()
 
     @property
     def next_scheduled_event(self) -> ScheduledEvent | None:
         return self.__event_scheduler__current
 
+    @property
+    def last_dispatch_batch(self) -> tuple[int, bool]:
+        """tuple[:class:`int`, :class:`bool`]: The number of events in the last batch, and whether more were due."""
+        return self.__event_scheduler__last_batch
+
+    @property
+    def scheduler_stats(self) -> SchedulerStats:
+        """:class:`SchedulerStats`: Dispatch lag, throughput and queue depth of the event scheduler."""
+        stats = self.__event_scheduler__stats
+        stored = len(self.__event_scheduler__heap) - len(self.__event_scheduler__tombstones)
+        stats.pending = stored + len(self.__event_scheduler__wheel)
+        return stats
+
+    async def fetch_scheduler_stats(self) -> SchedulerStats:
+        """Returns :attr:`scheduler_stats`, with the number of overdue stored events counted from the database."""
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        # this is a hack because >circular imports<
+        from ..config import CONFIG
+
+        stats = self.scheduler_stats
+        if not CONFIG.DATABASE.DISABLED:
+            async with self.pool.acquire() as connection:
+                stats.backlog = await Events.count_due(connection, _utcnow())
+        return stats
+
+    async def __listen(self) -> None:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        listener: asyncpg.Connection = await self.pool.acquire()  # type: ignore
+        try:
+            await listener.add_listener(EVENTS_CHANNEL, self.__on_notify)
+            listener.add_termination_listener(self.__on_listener_terminated)
+        except BaseException:
+            await self.pool.release(listener)
+            raise
+
+        self.__event_scheduler__listener = listener
+
+    def __on_listener_terminated(self, connection: asyncpg.Connection) -> None:
+        # The listener is cleared before it is released on close, so only a dropped connection is listened to again
+        if connection is not self.__event_scheduler__listener:
+            return
+
+        self.__event_scheduler__listener = None
+        self.__spawn(self.__relisten(connection))
+
+    async def __relisten(self, terminated: asyncpg.Connection) -> None:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        with suppress(asyncpg.exceptions.InterfaceError):
+            await self.pool.release(terminated)
+
+        # Events notified meanwhile are found when the window is next refilled, at least once per lease
+        delay = 1
+        while not self.is_closed():
+            try:
+                await self.__listen()
+            except (OSError, asyncpg.exceptions.PostgresConnectionError, asyncpg.exceptions.InterfaceError):
+                self.log.warning(f"Failed to listen for scheduled events, retrying in {delay}s.")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+            else:
+                self.log.info("Listening for scheduled events again after the connection was lost.")
+                return
+
+    def __spawn(self, coro: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(coro)
+        self.__event_scheduler__tasks.add(task)
+        task.add_done_callback(self.__event_scheduler__tasks.discard)
+
+    def __on_notify(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        id, time, type = payload.split(" ", 2)
+        scheduled_for = _as_utc(datetime.datetime.fromisoformat(time))
+
+        # Only used to wake the scheduler, the full event is read when it is claimed
+        event = ScheduledEvent(int(id), scheduled_for, scheduled_for, type, [], {})
+        self.__spawn(self.__wake_scheduler(event))
+
+    async def __wake_scheduler(self, *events: ScheduledEvent) -> None:
+        # Events past the end of the window are picked up when it is next refilled
+        async with self.__event_scheduler__condition:
+            window = self.__event_scheduler__window
+            if window is None:
+                return
+
+            pushed = False
+            for event in events:
+                if event.scheduled_for <= window:
+                    self.__push_event(event)
+                    pushed = True
+
+            if pushed:
+                self.__event_scheduler__condition.notify_all()
+
+    def __push_event(self, event: ScheduledEvent, at: datetime.datetime | None = None) -> None:
+        sequence = next(self.__event_scheduler__counter)
+        if event.id is not None:
+            if event.id in self.__event_scheduler__ids:
+                return
+            self.__event_scheduler__ids[event.id] = sequence
+
+        heapq.heappush(self.__event_scheduler__heap, (at or event.scheduled_for, sequence, event))
+
+    def __pop_event(self) -> ScheduledEvent:
+        _, sequence, event = heapq.heappop(self.__event_scheduler__heap)
+        if event.id is not None and self.__event_scheduler__ids.get(event.id) == sequence:
+            del self.__event_scheduler__ids[event.id]
+        return event
+
+    def __peek_event(self) -> tuple[datetime.datetime, int, ScheduledEvent] | None:
+        heap = self.__event_scheduler__heap
+        tombstones = self.__event_scheduler__tombstones
+
+        while heap and heap[0][1] in tombstones:
+            tombstones.discard(heapq.heappop(heap)[1])
+
+        return heap[0] if heap else None
+
+    def __discard_events(self, ids: set[int], until: datetime.datetime | None = None) -> None:
+        heap = self.__event_scheduler__heap
+        tombstones = self.__event_scheduler__tombstones
+
+        for id in ids:
+            sequence = self.__event_scheduler__ids.pop(id, None)
+            if sequence is not None:
+                tombstones.add(sequence)
+
+        # Due events sit at the top of the heap, so are popped rather than marked
+        if until is not None:
+            while (entry := self.__peek_event()) is not None and entry[0] <= until:
+                self.__pop_event()
+
+        # Rebuild once most of the heap is discarded entries, so they do not accumulate
+        if len(tombstones) > len(heap) // 2:
+            heap[:] = [entry for entry in heap if entry[1] not in tombstones]
+            heapq.heapify(heap)
+            tombstones.clear()
+
+    async def __fill_window(self, now: datetime.datetime) -> None:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        until = now + self.__event_scheduler__lookahead
+
+        # Refill at least once per lease so events leased by a lost process are recovered
+        lease = self.__event_scheduler__lease
+        if lease is not None:
+            until = min(until, now + lease)
+
+        async with self.pool.acquire() as connection:
+            records = await Events.fetch_upcoming(connection, until, self.__event_scheduler__window_size)
+
+        for record in records:
+            event = ScheduledEvent.from_record(record)
+            at = event.scheduled_for
+            if lease is not None and record["leased_until"] is not None:
+                at = max(at, _as_utc(record["leased_until"]))
+            if at <= until:
+                self.__push_event(event, at)
+
+        # If the window was filled only events up to the last one loaded are known
+        if len(records) >= self.__event_scheduler__window_size:
+            self.__event_scheduler__window = _as_utc(records[-1]["scheduled_for"])
+        else:
+            self.__event_scheduler__window = until
+
     async def _wait_for_event(self) -> ScheduledEvent:
+        async with self.__event_scheduler__condition:
+            while True:
+                now = _utcnow()
+                window = self.__event_scheduler__window
+
+                entry = self.__peek_event()
+                if entry is None and (window is None or window <= now):
+                    await self.__fill_window(now)
+                    continue
+
+                if entry is not None:
+                    scheduled_for, _, event = entry
+                    self.__event_scheduler__current = event
+
+                    if scheduled_for <= now:
+                        return self.__pop_event()
+
+                    timeout = (scheduled_for - now).total_seconds()
+                else:
+                    assert window is not None
+                    self.__event_scheduler__current = None
+                    timeout = (window - now).total_seconds()
+
+                # Woken early if an earlier event is scheduled
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self.__event_scheduler__condition.wait(), timeout)
+
+    async def __dispatch_batch(self, event: ScheduledEvent, batch_size: int) -> None:
         if TYPE_CHECKING:
             assert isinstance(self, BotBase)
 
+        now = _utcnow()
+        lease = self.__event_scheduler__lease
+        advanced: list[ScheduledEvent] = []
+        stats = self.__event_scheduler__stats
+
+        start = perf_counter()
         async with self.pool.acquire() as connection:
-            record = await Events.fetch_row(connection, order_by=(Events.scheduled_for, "ASC"))
+            if lease is not None:
+                records = await Events.lease_due(connection, now, batch_size, now + lease, self.__event_scheduler__owner)
+                full = bool(records) and records[0]["more"]
+            else:
+                # Recurring events are moved to their next occurrence rather than deleted
+                async with connection.transaction():
+                    records = await Events.claim_due(connection, now, batch_size)
+                    recurring = await Events.lock_due_recurring(connection, now, batch_size)
+                    advanced = [ScheduledEvent.from_record(record).advance(now) for record in recurring]
+                    if advanced:
+                        await Events.reschedule(connection, [(event.id, event.scheduled_for) for event in advanced])
+
+                full = (bool(records) and records[0]["more"]) or len(recurring) >= batch_size
+                records = [*records, *recurring]
+        stats.claim_time.observe(perf_counter() - start)
+
+        events = [ScheduledEvent.from_record(record) for record in records]
+        claimed = {claimed_event.id for claimed_event in events if claimed_event.id is not None}
+
+        async with self.__event_scheduler__condition:
+            if not full:
+                # Every due event has been claimed, either by this process or another
+                self.__discard_events(claimed, now)
+            else:
+                self.__discard_events(claimed)
+
+                # The event which woke the scheduler is still stored if the batch was cut short
+                if event.id not in claimed:
+                    self.__push_event(event)
+
+        self.__event_scheduler__last_batch = (len(events), full)
+        if full:
+            self.log.debug(f"Dispatched {len(events)} due scheduled events, more are still due.")
+
+        # Events whose lease ran out before dispatch may have been claimed elsewhere
+        if lease is not None and _utcnow() >= now + lease:
+            self.log.warning(f"Lease expired before dispatching {len(events)} scheduled events.")
+            return
+
+        dispatched_at = _utcnow()
+        for claimed_event in events:
+            stats.record_dispatch(claimed_event, dispatched_at)
+            claimed_event.dispatch(self)
+
+        if lease is not None and claimed:
+            owner = self.__event_scheduler__owner
+            advanced = [claimed_event.advance(now) for claimed_event in events if claimed_event.recurrence is not None]
+            completed = [claimed_event.id for claimed_event in events if claimed_event.recurrence is None]
 
-        if record is not None:
-            self.__event_scheduler__active.set()
-            return ScheduledEvent.from_record(record)
+            async with self.pool.acquire() as connection:
+                if completed:
+                    await Events.acknowledge(connection, completed, owner)  # type: ignore
+                if advanced:
+                    await Events.reschedule(connection, [(event.id, event.scheduled_for) for event in advanced], owner)
 
-        self.__event_scheduler__active.clear()
-        self.__event_scheduler__current = None
-        await self.__event_scheduler__active.wait()
-        return await self._wait_for_event()
+        await self.__wake_scheduler(*advanced)
 
     @tasks.loop(seconds=0)
     async def _dispatch_task(self) -> None:
         if TYPE_CHECKING:
             assert isinstance(self, BotBase)
 
-        event = self.__event_scheduler__current = await self._wait_for_event()
-        await discord.utils.sleep_until(event.scheduled_for)
+        event = await self._wait_for_event()
+
+        if self.__event_scheduler__batch_size is not None:
+            return await self.__dispatch_batch(event, self.__event_scheduler__batch_size)
 
+        advanced = None
         if event.id is not None:
+            claimed = True
+            start = perf_counter()
             async with self.pool.acquire() as connection:
-                await Events.delete(connection, id=event.id)
-
+                if event.recurrence is not None:
+                    advanced = event.advance(_utcnow())
+                    await Events.reschedule(connection, [(event.id, advanced.scheduled_for)])
+                else:
+                    claimed = await Events.claim(connection, event.id)
+            self.__event_scheduler__stats.claim_time.observe(perf_counter() - start)
+
+            # The event was cancelled, or dispatched by another process, after it was loaded
+            if not claimed:
+                return
+
+        self.__event_scheduler__stats.record_dispatch(event, _utcnow())
         event.dispatch(self)
 
+        if advanced is not None:
+            await self.__wake_scheduler(advanced)
+
+    def __add_ephemeral_event(self, event: ScheduledEvent, now: datetime.datetime) -> None:
+        loop = asyncio.get_running_loop()
+        wheel = self.__event_scheduler__wheel
+        next_deadline = wheel.next_deadline()
+
+        # Bring an idle wheel up to the current time before adding to it
+        if next_deadline is None:
+            wheel.advance(loop.time())
+
+        deadline = loop.time() + (event.scheduled_for - now).total_seconds()
+        wheel.add(deadline, event)
+
+        # Only wake the dispatcher if it would otherwise sleep past this event
+        if next_deadline is None or deadline < next_deadline:
+            self.__event_scheduler__wheel_wakeup.set()
+
+    @tasks.loop(seconds=0)
+    async def _ephemeral_dispatch_task(self) -> None:
+        loop = asyncio.get_running_loop()
+        wheel = self.__event_scheduler__wheel
+        wakeup = self.__event_scheduler__wheel_wakeup
+
+        now = _utcnow()
+        for event in wheel.advance(loop.time()):
+            self.__event_scheduler__stats.record_dispatch(event, now)
+            event.dispatch(self)
+
+            if event.recurrence is not None:
+                self.__add_ephemeral_event(event.advance(now), now)
+
+        wakeup.clear()
+        next_deadline = wheel.next_deadline()
+        if next_deadline is None:
+            await wakeup.wait()
+        else:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(wakeup.wait(), max(next_deadline - loop.time(), 0))
+
+    @tasks.loop(hours=1)
+    async def _partition_task(self) -> None:
+        if TYPE_CHECKING:
+            assert isinstance(self, BotBase)
+
+        assert self.__event_scheduler__partition_interval is not None
+
+        async with self.pool.acquire() as connection:
+            created, dropped = await Events.maintain_partitions(
+                connection, _utcnow(), self.__event_scheduler__partition_interval, self.__event_scheduler__partitions_ahead
+            )
+
+        if created or dropped:
+            self.log.info(f"Created {len(created)} and dropped {len(dropped)} scheduled event partitions.")
+
     @_dispatch_task.before_loop
     async def _before_dispatch_task(self):
         if TYPE_CHECKING:
@@ -1,5 +1,9 @@
+import datetime
+import json
+import re
 import zoneinfo
-from typing import ClassVar
+from collections.abc import Iterable
+from typing import Any, ClassVar
 
 import asyncpg
 from donphan import CachedTable, Column, SQLType, Table
@@ -8,6 +12,8 @@ from ..types import User
 
 __all__ = (
     "Commands",
+    "CommandUsage",
+    "CommandUsageUsers",
     "TimeZones",
     "Events",
     "Emoji",
@@ -16,7 +22,159 @@ __all__ = (
 )
 
 
-class Commands(Table, schema="logging"):
+PARTITION_BOUND = re.compile(r"FOR VALUES FROM \('(.+)'\) TO \('(.+)'\)")
+
+
+class RangePartitioned:
+    """Helpers for tables range partitioned by a timestamp column, named by ``_partition_key``."""
+
+    _name: ClassVar[str]
+    _local_name: ClassVar[str]
+    _schema: ClassVar[str]
+    _partition_key: ClassVar[str]
+    # The column definitions of the partitioned table, which donphan cannot create itself
+    _partition_columns: ClassVar[str]
+
+    @classmethod
+    async def create_partitioned(cls, connection: asyncpg.Connection, /) -> None:
+        """Creates the table range partitioned by ``_partition_key``, with a default partition for rows outside others."""
+        kind = await connection.fetchval("SELECT relkind::text FROM pg_class WHERE oid = to_regclass($1)", cls._name)
+        if kind == "p":
+            return
+        if kind is not None:
+            raise RuntimeError(f"{cls._name} already exists and is not partitioned.")
+
+        # The primary key of a partitioned table must include the partition key
+        async with connection.transaction():
+            await connection.execute(f"CREATE SCHEMA IF NOT EXISTS {cls._schema}")
+            await connection.execute(
+                f"CREATE TABLE {cls._name} ({cls._partition_columns}) PARTITION BY RANGE ({cls._partition_key})"
+            )
+            await connection.execute(f"CREATE TABLE {cls._name}_default PARTITION OF {cls._name} DEFAULT")
+
+    @classmethod
+    async def fetch_partitions(
+        cls, connection: asyncpg.Connection, /
+    ) -> list[tuple[str, datetime.datetime, datetime.datetime]]:
+        records = await connection.fetch(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) AS bound
+            FROM pg_inherits JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass($1)
+            """,
+            cls._name,
+        )
+
+        partitions = []
+        for record in records:
+            # The default partition has no bounds
+            match = PARTITION_BOUND.fullmatch(record["bound"])
+            if match is not None:
+                start, end = (
+                    datetime.datetime.fromisoformat(bound).replace(tzinfo=datetime.timezone.utc) for bound in match.groups()
+                )
+                partitions.append((record["relname"], start, end))
+
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    @classmethod
+    async def create_partition(
+        cls, connection: asyncpg.Connection, /, start: datetime.datetime, end: datetime.datetime
+    ) -> str:
+        # The bounds are written as naive UTC timestamps, the same values donphan's codec sends for the parameters
+        start, end = start.astimezone(datetime.timezone.utc), end.astimezone(datetime.timezone.utc)
+        name = f"{cls._local_name}_{start:%Y%m%d%H}"
+        table = f"{cls._schema}.{name}"
+
+        async with connection.transaction():
+            await connection.execute(f"CREATE TABLE {table} (LIKE {cls._name} INCLUDING DEFAULTS)")
+            # Rows in the new range are held by the default partition, which cannot overlap it once attached
+            await connection.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {cls._name}_default WHERE {cls._partition_key} >= $1 AND {cls._partition_key} < $2
+                    RETURNING *
+                )
+                INSERT INTO {table} SELECT * FROM moved
+                """,
+                start,
+                end,
+            )
+            await connection.execute(
+                f"ALTER TABLE {cls._name} ATTACH PARTITION {table} "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')"
+            )
+
+        return name
+
+    @classmethod
+    async def drop_partition(cls, connection: asyncpg.Connection, /, name: str, *, archive: bool = False) -> bool:
+        """Drops a partition, or when archiving detaches it and moves it to the ``<schema>_archive`` schema."""
+        table = f"{cls._schema}.{name}"
+
+        async with connection.transaction():
+            if archive:
+                await connection.execute(f"CREATE SCHEMA IF NOT EXISTS {cls._schema}_archive")
+                await connection.execute(f"ALTER TABLE {cls._name} DETACH PARTITION {table}")
+                await connection.execute(f"ALTER TABLE {table} SET SCHEMA {cls._schema}_archive")
+            else:
+                await connection.execute(f"DROP TABLE {table}")
+
+        return True
+
+    @classmethod
+    async def maintain_partitions(
+        cls,
+        connection: asyncpg.Connection,
+        /,
+        now: datetime.datetime,
+        interval: datetime.timedelta,
+        ahead: int,
+        retention: datetime.timedelta | None = datetime.timedelta(0),
+        *,
+        archive: bool = False,
+    ) -> tuple[list[str], list[str]]:
+        """Creates the current partition and those ahead of it, and drops partitions older than the retention.
+
+        Partitions are aligned to multiples of the interval since the unix epoch. A partition is only dropped once it
+        ends before the current partition starts, less the retention, or never if the retention is ``None``.
+        """
+        now = now.astimezone(datetime.timezone.utc)
+        epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+        current = epoch + (now - epoch) // interval * interval
+
+        partitions = await cls.fetch_partitions(connection)
+
+        created = []
+        for i in range(ahead + 1):
+            start = current + interval * i
+            end = start + interval
+            if not any(other_start < end and start < other_end for _, other_start, other_end in partitions):
+                created.append(await cls.create_partition(connection, start, end))
+
+        dropped = []
+        if retention is not None:
+            for name, _, end in partitions:
+                if end <= current - retention and await cls.drop_partition(connection, name, archive=archive):
+                    dropped.append(name)
+
+        return created, dropped
+
+
+class Commands(RangePartitioned, Table, schema="logging"):
+    _partition_key = "invoked_at"
+    _partition_columns = """
+        message_id BIGINT,
+        guild_id BIGINT,
+        channel_id BIGINT,
+        user_id BIGINT,
+        invoked_at TIMESTAMP NOT NULL,
+        prefix TEXT,
+        command TEXT,
+        failed BOOLEAN,
+        PRIMARY KEY (message_id, invoked_at)
+    """
+
     message_id: Column[SQLType.BigInt] = Column(primary_key=True)
     guild_id: Column[SQLType.BigInt] = Column(index=True)
     channel_id: Column[SQLType.BigInt] = Column(index=True)
@@ -26,11 +184,280 @@ class Commands(Table, schema="logging"):
     command: Column[SQLType.Text]
     failed: Column[SQLType.Boolean]
 
+    @classmethod
+    async def create_indexes(cls, connection: asyncpg.Connection, /) -> None:
+        # Rows are inserted in invocation order, so a BRIN index stays tiny while narrowing scans to recent blocks
+        await connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {cls._local_name}_invoked_at_brin_idx ON {cls._name} USING BRIN (invoked_at)"
+        )
+
+    @classmethod
+    async def delete_before(cls, connection: asyncpg.Connection, /, before: datetime.datetime) -> None:
+        # Naive timestamps are read as local time by donphan's codec, so the cutoff is sent as an aware UTC value
+        before = before.astimezone(datetime.timezone.utc)
+        await connection.execute(f"DELETE FROM {cls._name} WHERE invoked_at < $1", before)
+
+    @classmethod
+    async def fetch_recent(
+        cls, connection: asyncpg.Connection, /, limit: int, window: datetime.timedelta = datetime.timedelta(hours=1)
+    ) -> list[asyncpg.Record]:
+        """Fetches the most recent invocations, newest first.
+
+        There is no btree index on invoked_at to read in order, so a window back from now is scanned through the BRIN
+        index, doubling until it holds enough invocations or spans ten years.
+        """
+        while True:
+            records = await connection.fetch(
+                f"""
+                SELECT * FROM {cls._name} WHERE invoked_at >= (NOW() AT TIME ZONE 'UTC') - $2::interval
+                ORDER BY invoked_at DESC LIMIT $1
+                """,
+                limit,
+                window,
+            )
+            if len(records) >= limit or window >= datetime.timedelta(days=3650):
+                return records
+            window *= 2
+
+    @classmethod
+    async def copy_many(cls, connection: asyncpg.Connection, /, *values: dict[str, Any]) -> list[dict[str, Any]]:
+        """Copies invocations into the table, skipping those already stored, and returns those which were copied."""
+        columns = [column.name for column in cls._columns]
+
+        try:
+            # A savepoint when already in a transaction, so a conflict does not abort it
+            async with connection.transaction():
+                await connection.copy_records_to_table(
+                    cls._local_name,
+                    schema_name=cls._schema,
+                    columns=columns,
+                    records=[tuple(value[column] for column in columns) for value in values],
+                )
+            return list(values)
+        except asyncpg.UniqueViolationError:
+            pass
+
+        # COPY can not skip conflicting rows, so a batch with any is inserted instead, returning the rows written
+        columns = ["message_id", "guild_id", "channel_id", "user_id", "invoked_at", "prefix", "command", "failed"]
+        records = await connection.fetch(
+            f"""
+            INSERT INTO {cls._name} ({", ".join(columns)})
+            SELECT * FROM unnest(
+                $1::bigint[], $2::bigint[], $3::bigint[], $4::bigint[],
+                $5::timestamp[], $6::text[], $7::text[], $8::boolean[]
+            )
+            ON CONFLICT DO NOTHING
+            RETURNING *
+            """,
+            *([value[column] for value in values] for column in columns),
+        )
+        return [dict(record) for record in records]
+
+
+def _hour(time: datetime.datetime) -> datetime.datetime:
+    # Aware values are sent as UTC by donphan's codec, naive ones would be read as local time
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=datetime.timezone.utc)
+    return time.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+class CommandUsage(Table, schema="logging"):
+    """Hourly totals of command invocations per guild, direct messages are counted under guild 0.
+
+    Unique users are distinct within each command, guild and hour, so summing them over several hours or guilds
+    counts a user once for each.
+    """
+
+    guild_id: Column[SQLType.BigInt] = Column(primary_key=True)
+    hour: Column[SQLType.Timestamp] = Column(primary_key=True, index=True)
+    command: Column[SQLType.Text] = Column(primary_key=True)
+    invocations: Column[SQLType.Integer] = Column(default="0")
+    failures: Column[SQLType.Integer] = Column(default="0")
+    unique_users: Column[SQLType.Integer] = Column(default="0")
+
+    @classmethod
+    async def record(cls, connection: asyncpg.Connection, /, invokes: list[dict[str, Any]]) -> None:
+        """Adds logged command invocations to the rollup."""
+        if not invokes:
+            return
+
+        # Users are only counted the first time they are seen for each command, guild and hour
+        await connection.execute(
+            f"""
+            WITH batch AS (
+                SELECT * FROM unnest($1::bigint[], $2::timestamp[], $3::text[], $4::bigint[], $5::boolean[])
+                    AS batch (guild_id, hour, command, user_id, failed)
+            ),
+            new_users AS (
+                INSERT INTO {CommandUsageUsers._name} (guild_id, hour, command, user_id)
+                SELECT DISTINCT guild_id, hour, command, user_id FROM batch
+                ON CONFLICT DO NOTHING
+                RETURNING guild_id, hour, command
+            ),
+            users AS (
+                SELECT guild_id, hour, command, COUNT(*) AS unique_users FROM new_users GROUP BY guild_id, hour, command
+            )
+            INSERT INTO {cls._name} AS usage (guild_id, hour, command, invocations, failures, unique_users)
+            SELECT guild_id, hour, command, COUNT(*), COUNT(*) FILTER (WHERE failed), COALESCE(MAX(users.unique_users), 0)
+            FROM batch LEFT JOIN users USING (guild_id, hour, command)
+            GROUP BY guild_id, hour, command
+            ON CONFLICT (guild_id, hour, command) DO UPDATE SET
+                invocations = usage.invocations + EXCLUDED.invocations,
+                failures = usage.failures + EXCLUDED.failures,
+                unique_users = usage.unique_users + EXCLUDED.unique_users
+            """,
+            [invoke["guild_id"] or 0 for invoke in invokes],
+            [_hour(invoke["invoked_at"]) for invoke in invokes],
+            [invoke["command"] for invoke in invokes],
+            [invoke["user_id"] for invoke in invokes],
+            [invoke["failed"] for invoke in invokes],
+        )
+
+    @classmethod
+    async def backfill(
+        cls, connection: asyncpg.Connection, /, users_window: datetime.timedelta = datetime.timedelta(hours=2)
+    ) -> None:
+        """Builds the rollup from the logged commands, if it is empty.
+
+        Users counted in hours within ``users_window`` of now are also stored, so later invocations in those hours
+        do not count them again.
+        """
+        async with connection.transaction():
+            await connection.execute(f"LOCK TABLE {cls._name} IN EXCLUSIVE MODE")
+            if await connection.fetchval(f"SELECT EXISTS (SELECT 1 FROM {cls._name})"):
+                return
+
+            await connection.execute(
+                f"""
+                INSERT INTO {cls._name} (guild_id, hour, command, invocations, failures, unique_users)
+                SELECT COALESCE(guild_id, 0), date_trunc('hour', invoked_at), command,
+                    COUNT(*), COUNT(*) FILTER (WHERE failed), COUNT(DISTINCT user_id)
+                FROM {Commands._name}
+                GROUP BY 1, 2, 3
+                """
+            )
+            await connection.execute(
+                f"""
+                INSERT INTO {CommandUsageUsers._name} (guild_id, hour, command, user_id)
+                SELECT DISTINCT COALESCE(guild_id, 0), date_trunc('hour', invoked_at), command, user_id
+                FROM {Commands._name} WHERE invoked_at >= $1
+                ON CONFLICT DO NOTHING
+                """,
+                _hour(datetime.datetime.now(datetime.timezone.utc) - users_window),
+            )
+
+    @classmethod
+    def _build_filter(cls, since: datetime.datetime, **filters: Any) -> tuple[str, list[Any]]:
+        # Only filters which are set are included, so the planner can use the index for those given
+        clauses, args = ["hour >= $1"], [_hour(since)]
+        for column, value in filters.items():
+            if value is not None:
+                args.append(value)
+                clauses.append(f"{column} = ${len(args)}")
+        return " AND ".join(clauses), args
+
+    @classmethod
+    async def fetch_top(
+        cls,
+        connection: asyncpg.Connection,
+        /,
+        since: datetime.datetime,
+        *,
+        guild_id: int | None = None,
+        limit: int = 10,
+    ) -> list[asyncpg.Record]:
+        """Fetches the most invoked commands since a time, optionally in a single guild."""
+        where, args = cls._build_filter(since, guild_id=guild_id)
+        return await connection.fetch(
+            f"""
+            SELECT command, SUM(invocations) AS invocations, SUM(failures) AS failures
+            FROM {cls._name} WHERE {where}
+            GROUP BY command ORDER BY invocations DESC LIMIT {int(limit)}
+            """,
+            *args,
+        )
+
+    @classmethod
+    async def fetch_daily(
+        cls,
+        connection: asyncpg.Connection,
+        /,
+        since: datetime.datetime,
+        *,
+        command: str | None = None,
+        guild_id: int | None = None,
+    ) -> list[asyncpg.Record]:
+        """Fetches invocation totals for each UTC day since a time, optionally of one command or in a single guild."""
+        where, args = cls._build_filter(since, command=command, guild_id=guild_id)
+        return await connection.fetch(
+            f"""
+            SELECT date_trunc('day', hour) AS day, SUM(invocations) AS invocations, SUM(failures) AS failures
+            FROM {cls._name} WHERE {where}
+            GROUP BY day ORDER BY day ASC
+            """,
+            *args,
+        )
+
+
+class CommandUsageUsers(Table, schema="logging"):
+    """The users already counted towards :class:`CommandUsage`, only needed while an hour may still be recorded."""
+
+    guild_id: Column[SQLType.BigInt] = Column(primary_key=True)
+    hour: Column[SQLType.Timestamp] = Column(primary_key=True, index=True)
+    command: Column[SQLType.Text] = Column(primary_key=True)
+    user_id: Column[SQLType.BigInt] = Column(primary_key=True)
+
+    @classmethod
+    async def delete_before(cls, connection: asyncpg.Connection, /, before: datetime.datetime) -> None:
+        await connection.execute(f"DELETE FROM {cls._name} WHERE hour < $1", _hour(before))
+
 
 class TimeZones(CachedTable, schema="core", max_cache_size=128, cache_no_record=True):
+    # When preloaded every user's time zone is held in memory, as an index into the list of distinct time zones
+    _zones: ClassVar[list[zoneinfo.ZoneInfo]] = []
+    _zone_indexes: ClassVar[dict[str, int]] = {}
+    _user_zones: ClassVar[dict[int, int] | None] = None
+
     user_id: Column[SQLType.BigInt] = Column(primary_key=True)
     time_zone: Column[SQLType.Text] = Column(nullable=False)
 
+    @classmethod
+    def _zone_index(cls, time_zone: str) -> int:
+        # Each time zone is stored once, and users share the same int object for its index
+        index = cls._zone_indexes.get(time_zone)
+        if index is None:
+            cls._zones.append(zoneinfo.ZoneInfo(time_zone))
+            index = cls._zone_indexes[time_zone] = len(cls._zones) - 1
+        return index
+
+    @classmethod
+    async def preload(cls, connection: asyncpg.Connection, /) -> None:
+        """Loads every user's time zone into memory, after which looking up a time zone never queries the database.
+
+        Time zones set by other processes are not seen until preloaded again.
+        """
+        user_zones = {}
+        for user_id, time_zone in await connection.fetch(f"SELECT user_id, time_zone FROM {cls._name}"):
+            try:
+                user_zones[user_id] = cls._zone_index(time_zone)
+            except (ValueError, zoneinfo.ZoneInfoNotFoundError):
+                continue
+
+        cls._user_zones = user_zones
+
+    @classmethod
+    def lookup(cls, user_id: int) -> tuple[bool, zoneinfo.ZoneInfo | None]:
+        """Looks up a user's time zone without querying the database, returning whether it is known and the time zone."""
+        if cls._user_zones is not None:
+            index = cls._user_zones.get(user_id)
+            return True, cls._zones[index] if index is not None else None
+
+        cached_record = cls.get_cached(user_id=user_id)
+        if cached_record is not None:
+            return True, zoneinfo.ZoneInfo(cached_record["time_zone"])
+
+        return False, None
+
     @classmethod
     async def set_timezone(cls, connection: asyncpg.Connection, /, user: User, timezone: zoneinfo.ZoneInfo | None) -> None:
         if timezone is not None:
@@ -44,34 +471,335 @@ class TimeZones(CachedTable, schema="core", max_cache_size=128, cache_no_record=
         else:
             await TimeZones.delete(connection, user_id=user.id)
 
+        if cls._user_zones is not None:
+            if timezone is not None:
+                cls._user_zones[user.id] = cls._zone_index(str(timezone))
+            else:
+                cls._user_zones.pop(user.id, None)
+
     @classmethod
     async def get_timezone(cls, connection: asyncpg.Connection, /, user: User) -> zoneinfo.ZoneInfo | None:
+        if cls._user_zones is not None:
+            return cls.lookup(user.id)[1]
+
         record = await cls.fetch_row(connection, user_id=user.id)
         return zoneinfo.ZoneInfo(record["time_zone"]) if record is not None else None
 
+    @classmethod
+    async def get_timezones(
+        cls, connection: asyncpg.Connection | None, /, user_ids: Iterable[int]
+    ) -> dict[int, zoneinfo.ZoneInfo | None]:
+        """Fetches the time zones of many users at once, those not held in memory are fetched in a single query.
+
+        A connection is only needed if time zones have not been preloaded.
+        """
+        timezones: dict[int, zoneinfo.ZoneInfo | None] = {}
+        missing = []
+        for user_id in user_ids:
+            found, timezone = cls.lookup(user_id)
+            if found:
+                timezones[user_id] = timezone
+            else:
+                missing.append(user_id)
+
+        if missing:
+            if connection is None:
+                raise RuntimeError("A connection is required to fetch time zones which have not been preloaded.")
+
+            records = await connection.fetch(
+                f"SELECT user_id, time_zone FROM {cls._name} WHERE user_id = ANY($1::bigint[])", missing
+            )
+            timezones.update(dict.fromkeys(missing))
+            for user_id, time_zone in records:
+                timezones[user_id] = zoneinfo.ZoneInfo(time_zone)
+
+        return timezones
+
+
+class Events(RangePartitioned, Table, schema="core"):
+    _partition_key = "scheduled_for"
+    _partition_columns = """
+        id SERIAL,
+        created_at TIMESTAMP DEFAULT NOW(),
+        scheduled_for TIMESTAMP NOT NULL,
+        event_type TEXT NOT NULL,
+        data JSONB DEFAULT '{}'::jsonb,
+        leased_until TIMESTAMP,
+        leased_by TEXT,
+        recurrence JSONB,
+        PRIMARY KEY (id, scheduled_for)
+    """
 
-class Events(Table, schema="core"):
     id: Column[SQLType.Serial] = Column(primary_key=True)
     created_at: Column[SQLType.Timestamp] = Column(default="NOW()")
     scheduled_for: Column[SQLType.Timestamp] = Column(index=True)
     event_type: Column[SQLType.Text] = Column(nullable=False, index=True)
     data: Column[SQLType.JSONB] = Column(default="'{}'::jsonb")
+    leased_until: Column[SQLType.Timestamp] = Column(nullable=True)
+    leased_by: Column[SQLType.Text] = Column(nullable=True)
+    recurrence: Column[SQLType.JSONB] = Column(nullable=True)
+
+    @classmethod
+    async def migrate(cls, connection: asyncpg.Connection, /) -> None:
+        if await connection.fetchval("SELECT to_regclass($1) IS NOT NULL", cls._name):
+            await connection.execute(
+                f"""
+                ALTER TABLE {cls._name}
+                    ADD COLUMN IF NOT EXISTS leased_until TIMESTAMP,
+                    ADD COLUMN IF NOT EXISTS leased_by TEXT,
+                    ADD COLUMN IF NOT EXISTS recurrence JSONB
+                """
+            )
+
+    @classmethod
+    async def create_indexes(cls, connection: asyncpg.Connection, /) -> None:
+        await connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {cls._local_name}_data_idx ON {cls._name} USING GIN (data jsonb_path_ops)"
+        )
+
+    @classmethod
+    async def drop_partition(cls, connection: asyncpg.Connection, /, name: str, *, archive: bool = False) -> bool:
+        table = f"{cls._schema}.{name}"
+
+        # Partitions still holding events, such as those which came due while offline, are kept until drained
+        async with connection.transaction():
+            await connection.execute(f"LOCK TABLE {cls._name} IN ACCESS EXCLUSIVE MODE")
+            if await connection.fetchval(f"SELECT EXISTS (SELECT 1 FROM {table})"):
+                return False
+            await connection.execute(f"DROP TABLE {table}")
+
+        return True
+
+    @classmethod
+    async def fetch_matching(
+        cls, connection: asyncpg.Connection, /, event_type: str, data: dict[str, Any]
+    ) -> list[asyncpg.Record]:
+        return await connection.fetch(
+            f"SELECT * FROM {cls._name} WHERE event_type = $1 AND data @> $2::jsonb ORDER BY scheduled_for ASC",
+            event_type,
+            data,
+        )
+
+    @classmethod
+    async def delete_matching(
+        cls, connection: asyncpg.Connection, /, event_type: str, data: dict[str, Any]
+    ) -> list[asyncpg.Record]:
+        return await connection.fetch(
+            f"DELETE FROM {cls._name} WHERE event_type = $1 AND data @> $2::jsonb RETURNING *", event_type, data
+        )
+
+    @classmethod
+    async def delete_ids(cls, connection: asyncpg.Connection, /, ids: list[int]) -> list[asyncpg.Record]:
+        return await connection.fetch(f"DELETE FROM {cls._name} WHERE id = ANY($1::integer[]) RETURNING *", ids)
+
+    @classmethod
+    async def fetch_upcoming(
+        cls, connection: asyncpg.Connection, /, until: datetime.datetime, limit: int
+    ) -> list[asyncpg.Record]:
+        return await connection.fetch(
+            f"SELECT * FROM {cls._name} WHERE scheduled_for <= $1 ORDER BY scheduled_for ASC LIMIT $2", until, limit
+        )
+
+    @classmethod
+    async def insert_events(
+        cls, connection: asyncpg.Connection, /, records: list[tuple[datetime.datetime, str, dict[str, Any]]]
+    ) -> list[int]:
+        # ids are reserved up front, as the order rows are inserted in does not follow the order of unnest
+        ids = [
+            id
+            for (id,) in await connection.fetch(
+                "SELECT nextval(pg_get_serial_sequence($1, 'id')) FROM generate_series(1, $2)", cls._name, len(records)
+            )
+        ]
+
+        # jsonb is registered with a text codec, so the data is sent as text and cast by the server
+        await connection.execute(
+            f"""
+            INSERT INTO {cls._name} (id, scheduled_for, event_type, data)
+            SELECT * FROM unnest($1::int[], $2::timestamp[], $3::text[], $4::text[]::jsonb[])
+            """,
+            ids,
+            [scheduled_for for scheduled_for, _, _ in records],
+            [event_type for _, event_type, _ in records],
+            [json.dumps(data) for _, _, data in records],
+        )
+        return ids
+
+    @classmethod
+    async def claim(cls, connection: asyncpg.Connection, /, id: int) -> bool:
+        # Only one process deletes the row, so only that process dispatches the event
+        return await connection.fetchval(f"DELETE FROM {cls._name} WHERE id = $1 RETURNING id", id) is not None
+
+    @classmethod
+    async def claim_due(cls, connection: asyncpg.Connection, /, now: datetime.datetime, limit: int) -> list[asyncpg.Record]:
+        # one event past the limit is read to tell whether more are due, without counting them all
+        # bounding scheduled_for in the outer statement lets a partitioned table skip partitions ahead of now
+        return await connection.fetch(
+            f"""
+            WITH due AS (
+                SELECT id, scheduled_for FROM {cls._name}
+                WHERE scheduled_for <= $1 AND recurrence IS NULL ORDER BY scheduled_for ASC LIMIT $2 + 1
+            ), batch AS (
+                SELECT id FROM due ORDER BY scheduled_for ASC LIMIT $2
+            )
+            DELETE FROM {cls._name} AS events USING batch WHERE events.id = batch.id AND events.scheduled_for <= $1
+            RETURNING events.*, (SELECT COUNT(*) FROM due) > $2 AS more
+            """,
+            now,
+            limit,
+        )
+
+    @classmethod
+    async def lock_due_recurring(
+        cls, connection: asyncpg.Connection, /, now: datetime.datetime, limit: int
+    ) -> list[asyncpg.Record]:
+        return await connection.fetch(
+            f"""
+            SELECT * FROM {cls._name} WHERE scheduled_for <= $1 AND recurrence IS NOT NULL
+            ORDER BY scheduled_for ASC LIMIT $2
+            FOR UPDATE SKIP LOCKED
+            """,
+            now,
+            limit,
+        )
+
+    @classmethod
+    async def reschedule(
+        cls, connection: asyncpg.Connection, /, events: list[tuple[int, datetime.datetime]], owner: str | None = None
+    ) -> None:
+        # also releases any lease held by the owner
+        await connection.executemany(
+            f"""
+            UPDATE {cls._name} SET scheduled_for = $2, leased_until = NULL, leased_by = NULL
+            WHERE id = $1 AND ($3::text IS NULL OR leased_by = $3)
+            """,
+            [(id, time, owner) for id, time in events],
+        )
+
+    @classmethod
+    async def lease_due(
+        cls, connection: asyncpg.Connection, /, now: datetime.datetime, limit: int, until: datetime.datetime, owner: str
+    ) -> list[asyncpg.Record]:
+        # rows locked by another process are skipped rather than waited on
+        # one event past the limit is read to tell whether more are due, without counting them all
+        return await connection.fetch(
+            f"""
+            WITH due AS (
+                SELECT id, scheduled_for FROM {cls._name}
+                WHERE scheduled_for <= $1 AND (leased_until IS NULL OR leased_until <= $1)
+                ORDER BY scheduled_for ASC LIMIT $2 + 1
+                FOR UPDATE SKIP LOCKED
+            ), batch AS (
+                SELECT id FROM due ORDER BY scheduled_for ASC LIMIT $2
+            )
+            UPDATE {cls._name} AS events SET leased_until = $3, leased_by = $4
+            FROM batch WHERE events.id = batch.id AND events.scheduled_for <= $1
+            RETURNING events.*, (SELECT COUNT(*) FROM due) > $2 AS more
+            """,
+            now,
+            limit,
+            until,
+            owner,
+        )
+
+    @classmethod
+    async def count_due(cls, connection: asyncpg.Connection, /, now: datetime.datetime) -> int:
+        return await connection.fetchval(f"SELECT COUNT(*) FROM {cls._name} WHERE scheduled_for <= $1", now)  # type: ignore
+
+    @classmethod
+    async def acknowledge(cls, connection: asyncpg.Connection, /, ids: list[int], owner: str) -> None:
+        await connection.execute(f"DELETE FROM {cls._name} WHERE id = ANY($1::integer[]) AND leased_by = $2", ids, owner)
+
+    @classmethod
+    async def notify(cls, connection: asyncpg.Connection, /, channel: str, payload: str) -> None:
+        await connection.execute("SELECT pg_notify($1, $2)", channel, payload)
 
 
 class Emoji(CachedTable, schema="core"):
     emoji_id: Column[SQLType.BigInt] = Column(primary_key=True)
     last_fetched: Column[SQLType.Timestamp] = Column(default="NOW()")
+    # Identifies the image, so users with the same avatar share an emoji
+    image_key: Column[SQLType.Text] = Column(nullable=True, unique=True)
+
+    @classmethod
+    async def migrate(cls, connection: asyncpg.Connection, /) -> None:
+        if await connection.fetchval("SELECT to_regclass($1) IS NOT NULL", cls._name):
+            await connection.execute(f"ALTER TABLE {cls._name} ADD COLUMN IF NOT EXISTS image_key TEXT UNIQUE")
 
     @classmethod
     async def count(cls, connection: asyncpg.Connection) -> int:
         return await connection.fetchval(f"SELECT COUNT(*) FROM {cls._name}")  # type: ignore
 
+    @classmethod
+    async def _delete_cached(cls, connection: asyncpg.Connection, /, emoji_ids: Iterable[int]) -> None:
+        # Rows deleted by a bulk query are still held by the row cache, deleting them as records removes them from it
+        for emoji_id in emoji_ids:
+            record = cls.get_cached(emoji_id=emoji_id)
+            if record is not None:
+                await cls.delete_record(connection, record)  # type: ignore
+
+    @classmethod
+    async def delete_ids(cls, connection: asyncpg.Connection, /, emoji_ids: list[int]) -> None:
+        await connection.execute(f"DELETE FROM {cls._name} WHERE emoji_id = ANY($1::bigint[])", emoji_ids)
+        await cls._delete_cached(connection, emoji_ids)
+
+    @classmethod
+    async def update_last_fetched(cls, connection: asyncpg.Connection, /, fetched: dict[int, datetime.datetime]) -> None:
+        await connection.execute(
+            f"""
+            UPDATE {cls._name} AS emoji SET last_fetched = GREATEST(emoji.last_fetched, fetched.last_fetched)
+            FROM unnest($1::bigint[], $2::timestamp[]) AS fetched (emoji_id, last_fetched)
+            WHERE emoji.emoji_id = fetched.emoji_id
+            """,
+            list(fetched),
+            list(fetched.values()),
+        )
+
+    @classmethod
+    async def evict(cls, connection: asyncpg.Connection, /, limit: int, order: list[int]) -> list[int]:
+        # Emojis no user refers to are evicted first, then those unknown to the eviction policy, then in its order
+        records = await connection.fetch(
+            f"""
+            DELETE FROM {cls._name} WHERE emoji_id IN (
+                SELECT emoji_id FROM {cls._name} AS emoji
+                ORDER BY
+                    EXISTS (SELECT 1 FROM {UserEmoji._name} AS users WHERE users.emoji_id = emoji.emoji_id) ASC,
+                    array_position($2::bigint[], emoji_id) ASC NULLS FIRST,
+                    last_fetched ASC
+                LIMIT $1 FOR UPDATE SKIP LOCKED
+            )
+            RETURNING emoji_id
+            """,
+            limit,
+            order,
+        )
+        evicted = [emoji_id for (emoji_id,) in records]
+        await cls._delete_cached(connection, evicted)
+        return evicted
+
 
 class UserEmoji(CachedTable, schema="core"):
-    emoji_id: Column[SQLType.BigInt] = Column(primary_key=True, references=Emoji.emoji_id, cascade=True)
-    user_id: Column[SQLType.BigInt] = Column(index=True, unique=True)
+    user_id: Column[SQLType.BigInt] = Column(primary_key=True)
+    emoji_id: Column[SQLType.BigInt] = Column(index=True, references=Emoji.emoji_id, cascade=True)
     avatar_hash: Column[SQLType.Text] = Column(nullable=True)
 
+    @classmethod
+    async def migrate(cls, connection: asyncpg.Connection, /) -> None:
+        # Each emoji used to belong to a single user, as they are only a cache the old rows are dropped
+        primary_key = await connection.fetch(
+            """
+            SELECT attname FROM pg_index JOIN pg_attribute ON attrelid = indrelid AND attnum = ANY(indkey)
+            WHERE indrelid = to_regclass($1) AND indisprimary
+            """,
+            cls._name,
+        )
+        if [name for (name,) in primary_key] == ["emoji_id"]:
+            await connection.execute(f"DROP TABLE {cls._name}")
+
+    @classmethod
+    async def fetch_users(cls, connection: asyncpg.Connection, /, user_ids: list[int]) -> list[asyncpg.Record]:
+        return await connection.fetch(f"SELECT * FROM {cls._name} WHERE user_id = ANY($1::bigint[])", user_ids)
+
 
 class HTTPSessions(CachedTable, schema="web", max_cache_size=128):
     key: Column[SQLType.UUID] = Column(primary_key=True)
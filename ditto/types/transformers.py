@@ -17,6 +17,15 @@ __all__ = (
 )
 
 
+async def get_timezone(interaction: discord.Interaction[BotBase]) -> datetime.tzinfo:
+    found, timezone = TimeZones.lookup(interaction.user.id)
+    if not found:
+        async with interaction.client.pool.acquire() as connection:
+            timezone = await TimeZones.get_timezone(connection, interaction.user)
+
+    return timezone or datetime.timezone.utc
+
+
 class GuildTransformer(discord.app_commands.Transformer):
     @property
     def type(self) -> discord.AppCommandOptionType:
@@ -42,12 +51,7 @@ class GuildTransformer(discord.app_commands.Transformer):
 
 class DatetimeTransformer(discord.app_commands.Transformer):
     async def transform(self, interaction: discord.Interaction[BotBase], value: str) -> datetime.datetime:
-        cached_record = TimeZones.get_cached(user_id=interaction.user.id)
-        if cached_record is not None:
-            timezone = zoneinfo.ZoneInfo(cached_record["time_zone"])
-        else:
-            async with interaction.client.pool.acquire() as connection:
-                timezone = await TimeZones.get_timezone(connection, interaction.user) or datetime.timezone.utc
+        timezone = await get_timezone(interaction)
 
         now = interaction.created_at.astimezone(tz=timezone)
 
@@ -68,12 +72,7 @@ class DatetimeTransformer(discord.app_commands.Transformer):
         if value is None:
             return []
 
-        cached_record = TimeZones.get_cached(user_id=interaction.user.id)
-        if cached_record is not None:
-            timezone = zoneinfo.ZoneInfo(cached_record["time_zone"])
-        else:
-            async with interaction.client.pool.acquire() as connection:
-                timezone = await TimeZones.get_timezone(connection, interaction.user) or datetime.timezone.utc
+        timezone = await get_timezone(interaction)
 
         now = interaction.created_at.astimezone(tz=timezone)
 
@@ -90,12 +89,7 @@ class DatetimeTransformer(discord.app_commands.Transformer):
 
 class WhenAndWhatTransformer(discord.app_commands.Transformer):
     async def transform(self, interaction: discord.Interaction[BotBase], value: str) -> tuple[datetime.datetime, str]:
-        cached_record = TimeZones.get_cached(user_id=interaction.user.id)
-        if cached_record is not None:
-            timezone = zoneinfo.ZoneInfo(cached_record["time_zone"])
-        else:
-            async with interaction.client.pool.acquire() as connection:
-                timezone = await TimeZones.get_timezone(connection, interaction.user) or datetime.timezone.utc
+        timezone = await get_timezone(interaction)
 
         now = interaction.created_at.astimezone(tz=timezone)
 
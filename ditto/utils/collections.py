@@ -1,16 +1,19 @@
 import datetime
+import math
 from collections import defaultdict, OrderedDict
 from collections.abc import Callable
-from typing import Any, TypeVar
+from typing import Any, Generic, TypeVar
 
 __all__ = (
     "summarise_list",
     "format_list",
     "LRUDict",
     "LRUDefaultDict",
+    "SizedLRUDict",
     "TimedDict",
     "TimedLRUDict",
     "TimedLRUDefaultDict",
+    "TimerWheel",
 )
 
 
@@ -138,6 +141,63 @@ class LRUDict(OrderedDict[T, V]):
             self.popitem(last=False)
 
 
+class SizedLRUDict(OrderedDict[T, V]):
+    """An LRU dict bounded by the total size of its values rather than their number.
+
+    Values larger than the maximum size are not stored.
+    """
+
+    def __init__(self, max_size: int, sizeof: Callable[[V], int] = len, *args, **kwargs):  # type: ignore
+        if max_size <= 0:
+            raise ValueError("Maximum cache size must be greater than 0.")
+
+        self.max_size = max_size
+        self.size = 0
+        self._sizeof = sizeof
+        super().__init__(*args, **kwargs)
+
+    def __getitem__(self, key: T) -> V:
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+
+        return value
+
+    def __setitem__(self, key: T, value: V) -> None:
+        if key in self:
+            del self[key]
+
+        size = self._sizeof(value)
+        if size > self.max_size:
+            return
+
+        super().__setitem__(key, value)
+        self.size += size
+
+        while self.size > self.max_size:
+            self.popitem(last=False)
+
+    def __delitem__(self, key: T) -> None:
+        self.size -= self._sizeof(super().__getitem__(key))
+        super().__delitem__(key)
+
+    def popitem(self, last: bool = True) -> tuple[T, V]:
+        key, value = super().popitem(last=last)
+        self.size -= self._sizeof(value)
+        return key, value
+
+    def pop(self, key: T, *default: Any) -> V:
+        if key not in self:
+            return super().pop(key, *default)
+
+        value = super().pop(key)
+        self.size -= self._sizeof(value)
+        return value
+
+    def clear(self) -> None:
+        super().clear()
+        self.size = 0
+
+
 # Alternate implementation to avoid MRO issues
 class _LRUDict(dict[T, V]):
     def __init__(self, max_size: int = 1024, *args, **kwargs):
@@ -179,3 +239,110 @@ class TimedLRUDefaultDict(_LRUDict[T, V], TimedDict[T, V], defaultdict[T, V]):
     ):
         super().__init__(max_size, expires_after, *args, **kwargs)
         self.default_factory = default_factory
+
+
+class TimerWheel(Generic[T]):
+    """A hierarchical timer wheel.
+
+    Items are bucketed by the tick they expire on, each level covering ``slots`` times the span of the level below.
+    Items in higher levels are cascaded down as the wheel turns, so adding and expiring an item is O(1).
+    """
+
+    def __init__(self, resolution: float = 0.1, slots: int = 64, levels: int = 4, now: float = 0) -> None:
+        if resolution <= 0:
+            raise ValueError("Timer wheel resolution must be greater than 0.")
+        if slots < 2 or levels < 1:
+            raise ValueError("Timer wheel must have at least 2 slots and 1 level.")
+
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+
+        self._tick: int = math.floor(now / resolution)
+        self._wheels: list[list[list[tuple[int, T]]]] = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._overflow: list[tuple[int, T]] = []
+        self._due: list[T] = []
+        self._count: int = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def _place(self, tick: int, item: T, expired: list[T]) -> None:
+        delta = tick - self._tick
+        if delta <= 0:
+            expired.append(item)
+            return
+
+        span = 1
+        for wheel in self._wheels:
+            if delta < span * self.slots:
+                wheel[(tick // span) % self.slots].append((tick, item))
+                return
+            span *= self.slots
+
+        self._overflow.append((tick, item))
+
+    def add(self, deadline: float, item: T) -> None:
+        """Adds an item which expires at the given deadline."""
+        self._place(math.ceil(deadline / self.resolution), item, self._due)
+        self._count += 1
+
+    def advance(self, now: float) -> list[T]:
+        """Turns the wheel up to now, returning the items which have expired."""
+        expired, self._due = self._due, []
+        target = math.floor(now / self.resolution)
+
+        if self._count == len(expired):
+            self._tick = max(self._tick, target)
+
+        while self._tick < target:
+            self._tick += 1
+
+            # Cascade items from higher levels as the lower level wraps around
+            span = self.slots ** (self.levels - 1)
+            if self._tick % (span * self.slots) == 0:
+                overflow, self._overflow = self._overflow, []
+                for tick, item in overflow:
+                    self._place(tick, item, expired)
+
+            for level in range(self.levels - 1, 0, -1):
+                if self._tick % span == 0:
+                    slot = self._wheels[level][(self._tick // span) % self.slots]
+                    items, slot[:] = slot[:], []
+                    for tick, item in items:
+                        self._place(tick, item, expired)
+                span //= self.slots
+
+            slot = self._wheels[0][self._tick % self.slots]
+            expired.extend(item for _, item in slot)
+            slot.clear()
+
+            if self._count == len(expired):
+                self._tick = target
+                break
+
+        self._count -= len(expired)
+        return expired
+
+    def next_deadline(self) -> float | None:
+        """Returns the next time the wheel should be advanced, or None if it is empty.
+
+        This is exact for items due before the lowest level next wraps around, otherwise it is the time it wraps, when
+        higher levels cascade items which may be due sooner.
+        """
+        if not self._count:
+            return None
+        if self._due:
+            return self._tick * self.resolution
+
+        # Items cascaded at the boundary may be due before anything already in the lowest level
+        boundary = self._tick - self._tick % self.slots + self.slots
+        wheel = self._wheels[0]
+        for tick in range(self._tick + 1, boundary):
+            if wheel[tick % self.slots]:
+                return tick * self.resolution
+
+        return boundary * self.resolution
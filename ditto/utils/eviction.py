@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import ClassVar, Generic, TypeVar
+
+__all__ = (
+    "EvictionPolicy",
+    "LRUPolicy",
+    "LFUPolicy",
+    "TwoQueuePolicy",
+    "EVICTION_POLICIES",
+)
+
+
+K = TypeVar("K", bound=Hashable)
+
+
+class EvictionPolicy(ABC, Generic[K]):
+    """Decides which keys of a cache are evicted first.
+
+    The cache itself is stored elsewhere, the policy is only told which keys are inserted, accessed and removed.
+    """
+
+    name: ClassVar[str]
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def __contains__(self, key: object) -> bool:
+        ...
+
+    @abstractmethod
+    def insert(self, key: K) -> None:
+        ...
+
+    @abstractmethod
+    def access(self, key: K) -> None:
+        ...
+
+    @abstractmethod
+    def remove(self, key: K) -> None:
+        ...
+
+    @abstractmethod
+    def order(self) -> list[K]:
+        """Returns every key, in the order they should be evicted."""
+        ...
+
+
+class LRUPolicy(EvictionPolicy[K]):
+    """Evicts the least recently used keys first."""
+
+    name = "lru"
+
+    def __init__(self) -> None:
+        self._keys: OrderedDict[K, None] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+    def insert(self, key: K) -> None:
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+
+    def access(self, key: K) -> None:
+        if key in self._keys:
+            self._keys.move_to_end(key)
+
+    def remove(self, key: K) -> None:
+        self._keys.pop(key, None)
+
+    def order(self) -> list[K]:
+        return list(self._keys)
+
+
+class LFUPolicy(EvictionPolicy[K]):
+    """Evicts the least frequently used keys first.
+
+    Each key's use count halves every ``half_life`` seconds, so keys which were popular long ago are not kept forever.
+    """
+
+    name = "lfu"
+
+    def __init__(self, half_life: float = 86400, clock: Callable[[], float] = time.monotonic) -> None:
+        if half_life <= 0:
+            raise ValueError("Half life must be greater than 0.")
+
+        self.half_life: float = half_life
+        self._clock: Callable[[], float] = clock
+        # Use count of each key, and when it was last updated
+        self._counts: dict[K, tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._counts
+
+    def _decayed(self, key: K, now: float) -> float:
+        count, updated = self._counts[key]
+        return count * 0.5 ** ((now - updated) / self.half_life)
+
+    def insert(self, key: K) -> None:
+        self._counts[key] = (1, self._clock())
+
+    def access(self, key: K) -> None:
+        if key in self._counts:
+            now = self._clock()
+            self._counts[key] = (self._decayed(key, now) + 1, now)
+
+    def remove(self, key: K) -> None:
+        self._counts.pop(key, None)
+
+    def order(self) -> list[K]:
+        now = self._clock()
+        return sorted(self._counts, key=lambda key: self._decayed(key, now))
+
+
+class TwoQueuePolicy(EvictionPolicy[K]):
+    """A scan resistant policy, after 2Q.
+
+    New keys are held in a FIFO probation queue, and only promoted to an LRU protected queue when used again. Keys
+    used once, such as by a scan over many users, are evicted before any key which has been used repeatedly, as long
+    as the probation queue holds at least ``probation_ratio`` of all keys.
+    """
+
+    name = "2q"
+
+    def __init__(self, probation_ratio: float = 0.25) -> None:
+        if not 0 < probation_ratio < 1:
+            raise ValueError("Probation ratio must be between 0 and 1.")
+
+        self.probation_ratio: float = probation_ratio
+        self._probation: OrderedDict[K, None] = OrderedDict()
+        self._protected: OrderedDict[K, None] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._probation) + len(self._protected)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._probation or key in self._protected
+
+    def insert(self, key: K) -> None:
+        self.remove(key)
+        self._probation[key] = None
+
+    def access(self, key: K) -> None:
+        if key in self._probation:
+            del self._probation[key]
+            self._protected[key] = None
+        elif key in self._protected:
+            self._protected.move_to_end(key)
+
+    def remove(self, key: K) -> None:
+        self._probation.pop(key, None)
+        self._protected.pop(key, None)
+
+    def order(self) -> list[K]:
+        # The protected queue only gives up keys once probation has shrunk below its share
+        protected = list(self._protected)
+        reserved = max(int(len(self) * self.probation_ratio) - len(self._probation), 0)
+        return protected[:reserved] + list(self._probation) + protected[reserved:]
+
+
+EVICTION_POLICIES: dict[str, type[EvictionPolicy]] = {
+    policy.name: policy for policy in (LRUPolicy, LFUPolicy, TwoQueuePolicy)
+}
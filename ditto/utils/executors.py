@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from time import perf_counter
+from typing import Any, TypeVar
+
+from .metrics import Histogram
+
+__all__ = ("CPUExecutor",)
+
+
+T = TypeVar("T")
+
+
+class CPUExecutor:
+    """Runs CPU bound functions off the event loop.
+
+    A process pool is used where the platform supports one, falling back to a thread pool otherwise. Functions run
+    in a process pool, and their arguments and results, must be picklable.
+
+    At most ``workers + max_queued`` calls are submitted at once, further calls wait their turn.
+    """
+
+    def __init__(self, workers: int | None = None, max_queued: int = 0, *, processes: bool = True) -> None:
+        if workers is not None and workers < 1:
+            raise ValueError("Executor workers must be greater than 0.")
+        if max_queued < 0:
+            raise ValueError("Executor max queued must not be negative.")
+
+        self.workers: int = workers or os.cpu_count() or 1
+        self.max_queued: int = max_queued
+
+        self._executor: Executor = self._create_executor(processes)
+        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(self.workers + max_queued)
+
+        # Calls submitted to the pool, and those waiting to be submitted
+        self.submitted: int = 0
+        self.waiting: int = 0
+        self.completed: int = 0
+        # Seconds from submitting a call to its result, including time queued in the pool
+        self.run_time: Histogram = Histogram.exponential(0.001, 2, 16)
+
+    def _create_executor(self, processes: bool) -> Executor:
+        if processes:
+            try:
+                return ProcessPoolExecutor(self.workers)
+            except (ImportError, NotImplementedError, OSError):
+                pass
+        return ThreadPoolExecutor(self.workers, thread_name_prefix="ditto-cpu")
+
+    @property
+    def uses_processes(self) -> bool:
+        return isinstance(self._executor, ProcessPoolExecutor)
+
+    @property
+    def running(self) -> int:
+        return min(self.submitted, self.workers)
+
+    @property
+    def queued(self) -> int:
+        """:class:`int`: The number of calls submitted to the pool but not yet started, or waiting to be submitted."""
+        return max(self.submitted - self.workers, 0) + self.waiting
+
+    async def run(self, func: Callable[..., T], /, *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.submitted += 1
+        start = perf_counter()
+        try:
+            executor = self._executor
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                # Worker processes could not be started, or were killed, so fall back to threads
+                if executor is self._executor:
+                    executor.shutdown(wait=False)
+                    self._executor = self._create_executor(False)
+                return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.submitted -= 1
+            self.completed += 1
+            self.run_time.observe(perf_counter() - start)
+            self._semaphore.release()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
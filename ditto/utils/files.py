@@ -1,5 +1,22 @@
+from __future__ import annotations
+
+import asyncio
+import os
 import pathlib
+import re
+import tempfile
 import types
+from collections import OrderedDict
+from contextlib import suppress
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from _typeshed import StrPath
+
+__all__ = (
+    "get_base_dir",
+    "DiskCache",
+)
 
 
 def get_base_dir(module: types.ModuleType | None = None) -> pathlib.Path:
@@ -15,3 +32,104 @@ def get_base_dir(module: types.ModuleType | None = None) -> pathlib.Path:
         return pathlib.Path(file).parent.relative_to(pathlib.Path.cwd())
     except ValueError:
         return pathlib.Path(file).parent
+
+
+class DiskCache:
+    """A directory of cached files.
+
+    Once the files grow past the maximum size the least recently used are deleted. Which files are cached, and in
+    what order they were used, is read from the directory once and then tracked in memory. Reads and writes run in
+    the default executor, so do not block the event loop.
+    """
+
+    def __init__(self, directory: StrPath, max_size: int) -> None:
+        if max_size <= 0:
+            raise ValueError("Maximum cache size must be greater than 0.")
+
+        self.directory: pathlib.Path = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size: int = max_size
+
+        # Size of each cached file, least recently used first
+        self._files: OrderedDict[str, int] = OrderedDict()
+        files = []
+        for file in self.directory.iterdir():
+            if not file.is_file():
+                continue
+            # Left behind by a write which was interrupted
+            if file.suffix == ".tmp":
+                with suppress(OSError):
+                    file.unlink()
+                continue
+            stat = file.stat()
+            files.append((stat.st_mtime, file.name, stat.st_size))
+
+        for _, name, size in sorted(files):
+            self._files[name] = size
+        self.size: int = sum(self._files.values())
+
+    def _filename(self, name: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+    def _read(self, path: pathlib.Path) -> bytes:
+        data = path.read_bytes()
+
+        # The modification time marks when a file was last used, so the order survives a restart
+        with suppress(OSError):
+            os.utime(path)
+
+        return data
+
+    def _write(self, path: pathlib.Path, data: bytes) -> None:
+        # Written to a temporary file first so a partially written file is never read
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with open(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp, path)
+        except BaseException:
+            with suppress(OSError):
+                os.unlink(temp)
+            raise
+
+    def _delete(self, paths: list[pathlib.Path]) -> None:
+        for path in paths:
+            with suppress(FileNotFoundError):
+                path.unlink()
+
+    async def get(self, name: str) -> bytes | None:
+        filename = self._filename(name)
+        if filename not in self._files:
+            return None
+
+        self._files.move_to_end(filename)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, self._read, self.directory / filename)
+        except FileNotFoundError:
+            # Deleted from outside the cache
+            self.size -= self._files.pop(filename, 0)
+            return None
+
+    async def set(self, name: str, data: bytes) -> None:
+        if len(data) > self.max_size:
+            return
+
+        filename = self._filename(name)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write, self.directory / filename, data)
+
+        self.size += len(data) - self._files.pop(filename, 0)
+        self._files[filename] = len(data)
+
+        if self.size > self.max_size:
+            await loop.run_in_executor(None, self._delete, self._prune())
+
+    def _prune(self) -> list[pathlib.Path]:
+        # The file just set is used most recently, and fits within the maximum size alone, so is never evicted
+        evicted = []
+        while self.size > self.max_size:
+            filename, size = self._files.popitem(last=False)
+            self.size -= size
+            evicted.append(self.directory / filename)
+        return evicted
@@ -1,8 +1,14 @@
+import hashlib
 import io
 
-from PIL import Image
+from PIL import Image, ImageChops, ImageDraw, ImageSequence
 
-__all__ = ("to_bytes",)
+__all__ = (
+    "to_bytes",
+    "mask_circle",
+    "mask_circle_animated",
+    "solid_colour",
+)
 
 
 def to_bytes(image: Image.Image, /, format: str = "png") -> io.BytesIO:
@@ -10,3 +16,112 @@ def to_bytes(image: Image.Image, /, format: str = "png") -> io.BytesIO:
     image.save(image_fp, format=format)
     image_fp.seek(0)
     return image_fp
+
+
+# The functions below take and return encoded images so they can be run in a process pool
+
+
+def mask_circle(data: bytes, /, format: str = "png") -> bytes:
+    """Crops an image to the largest circle it contains, keeping any existing transparency."""
+    image = Image.open(io.BytesIO(data))
+
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+
+    _, _, _, alpha = image.split()
+    if alpha.mode != "L":
+        alpha = alpha.convert("L")
+
+    mask = ImageChops.darker(_circle(image.size), alpha)
+    image.putalpha(mask)
+
+    return to_bytes(image, format=format).getvalue()
+
+
+def _circle(size: tuple[int, int]) -> Image.Image:
+    mask = Image.new("L", size)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((0, 0) + size, fill=255)
+    return mask
+
+
+def _encode_gif(frames: list[tuple[Image.Image, int]], colours: int) -> bytes:
+    # GIF transparency is all or nothing, so the last palette entry is reserved for transparent pixels
+    transparent = colours - 1
+
+    encoded = []
+    for frame, _ in frames:
+        _, _, _, alpha = frame.split()
+        paletted = frame.convert("RGB").quantize(colours - 1, method=Image.Quantize.MEDIANCUT)
+        paletted.paste(transparent, mask=alpha.point(lambda a: 255 if a < 128 else 0))
+        encoded.append(paletted)
+
+    image_fp = io.BytesIO()
+    encoded[0].save(
+        image_fp,
+        format="gif",
+        save_all=True,
+        append_images=encoded[1:],
+        duration=[duration for _, duration in frames],
+        loop=0,
+        disposal=2,
+        transparency=transparent,
+        optimize=False,
+    )
+    return image_fp.getvalue()
+
+
+def _drop_frames(frames: list[tuple[Image.Image, int]], max_frames: int) -> list[tuple[Image.Image, int]]:
+    if len(frames) <= max_frames:
+        return frames
+
+    # Keep evenly spaced frames, each shown for as long as the frames dropped after it
+    kept = []
+    for index in range(max_frames):
+        start, end = index * len(frames) // max_frames, (index + 1) * len(frames) // max_frames
+        kept.append((frames[start][0], sum(duration for _, duration in frames[start:end])))
+    return kept
+
+
+def mask_circle_animated(data: bytes, /, max_size: int = 256 * 1024, max_frames: int = 48) -> bytes:
+    """Crops each frame of an animated image to the largest circle it contains, encoded as a GIF.
+
+    Identical frames are only masked once, and consecutive identical frames are merged. Frames are dropped and colours
+    reduced until the GIF is at most ``max_size`` bytes, raising :class:`ValueError` if it can not be made to fit.
+    """
+    image = Image.open(io.BytesIO(data))
+    circle = _circle(image.size)
+
+    masked: dict[bytes, Image.Image] = {}
+    frames: list[tuple[Image.Image, int]] = []
+    previous = None
+    for frame in ImageSequence.Iterator(image):
+        duration = frame.info.get("duration", 100)
+        frame = frame.convert("RGBA")
+
+        digest = hashlib.blake2b(frame.tobytes(), digest_size=16).digest()
+        if digest == previous:
+            frame, last = frames[-1]
+            frames[-1] = (frame, last + duration)
+            continue
+        previous = digest
+
+        if digest not in masked:
+            _, _, _, alpha = frame.split()
+            frame.putalpha(ImageChops.darker(circle, alpha))
+            masked[digest] = frame
+        frames.append((masked[digest], duration))
+
+    # Each attempt costs an encode, so only a few are made
+    for frame_limit in (max_frames, max_frames // 2, max_frames // 4):
+        dropped = _drop_frames(frames, max(frame_limit, 1))
+        for colours in (256, 64, 16):
+            encoded = _encode_gif(dropped, colours)
+            if len(encoded) <= max_size:
+                return encoded
+
+    raise ValueError("Animated image could not be made to fit the size limit.")
+
+
+def solid_colour(size: tuple[int, int], colour: tuple[int, int, int], /, format: str = "png") -> bytes:
+    return to_bytes(Image.new("RGB", size, colour), format=format).getvalue()
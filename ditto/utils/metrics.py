@@ -0,0 +1,63 @@
+import bisect
+import math
+from collections.abc import Iterator, Sequence
+
+__all__ = ("Histogram",)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        if not buckets:
+            raise ValueError("A histogram must have at least one bucket.")
+
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        self.counts: list[int] = [0] * (len(self.buckets) + 1)
+        self.count: int = 0
+        self.total: float = 0
+        self.min: float = math.inf
+        self.max: float = -math.inf
+
+    @classmethod
+    def exponential(cls, start: float, factor: float, count: int) -> "Histogram":
+        return cls([start * factor**i for i in range(count)])
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0
+
+    def quantile(self, q: float) -> float:
+        """Returns the upper bound of the bucket the q-th quantile falls in, clamped to the observed range."""
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1.")
+        if not self.count:
+            return 0
+        if q == 0:
+            return self.min
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(bound, self.max)
+        return self.max
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __iter__(self) -> Iterator[tuple[float, int]]:
+        yield from zip((*self.buckets, math.inf), self.counts)
+
+    def __repr__(self) -> str:
+        return f"<Histogram count={self.count} mean={self.mean:.4g} max={self.max:.4g}>"
@@ -6,12 +6,56 @@ from typing import TYPE_CHECKING, Literal, overload
 import discord
 
 from ..types import User
+from .collections import SizedLRUDict
+from .files import DiskCache
 
 if TYPE_CHECKING:
+    from _typeshed import StrPath
     from discord.asset import ValidAssetFormatTypes, ValidStaticFormatTypes
 
 
-__all__ = ("download_avatar",)
+__all__ = (
+    "configure_avatar_cache",
+    "download_avatar",
+)
+
+
+AvatarKey = tuple[str, int, str, bool]
+
+
+_memory_cache: SizedLRUDict[AvatarKey, bytes] | None = None
+_disk_cache: DiskCache | None = None
+
+
+def configure_avatar_cache(max_memory: int, directory: StrPath | None = None, max_disk: int = 0) -> None:
+    """Caches avatars downloaded by :func:`download_avatar` in memory, and optionally on disk.
+
+    Sizes are in bytes. Cached avatars are keyed by their asset key, which changes whenever the avatar does.
+    """
+    global _memory_cache, _disk_cache
+    _memory_cache = SizedLRUDict(max_memory)
+    _disk_cache = DiskCache(directory, max_disk) if directory is not None else None
+
+
+async def _get_cached_avatar(key: AvatarKey) -> bytes | None:
+    if _memory_cache is not None and key in _memory_cache:
+        return _memory_cache[key]
+
+    if _disk_cache is not None:
+        data = await _disk_cache.get("_".join(map(str, key)))
+        if data is not None:
+            if _memory_cache is not None:
+                _memory_cache[key] = data
+            return data
+
+    return None
+
+
+async def _cache_avatar(key: AvatarKey, data: bytes) -> None:
+    if _memory_cache is not None:
+        _memory_cache[key] = data
+    if _disk_cache is not None:
+        await _disk_cache.set("_".join(map(str, key)), data)
 
 
 @overload
@@ -31,6 +75,11 @@ async def download_avatar(
 async def download_avatar(
     user: User, size: int = 256, static: bool = False, format: ValidAssetFormatTypes = "png"
 ) -> io.BytesIO:
+    key = (user.display_avatar.key, size, format, static)
+    data = await _get_cached_avatar(key)
+    if data is not None:
+        return io.BytesIO(data)
+
     avatar = io.BytesIO()
     if static:
         try:
@@ -42,4 +91,6 @@ async def download_avatar(
             await user.display_avatar.replace(size=size, format=format).save(avatar)
         except discord.NotFound:
             await user.default_avatar.replace(size=size, format=format).save(avatar)
+
+    await _cache_avatar(key, avatar.getvalue())
     return avatar
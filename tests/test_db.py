@@ -0,0 +1,96 @@
+import datetime
+import os
+from unittest import IsolatedAsyncioTestCase, TestCase, skipUnless
+
+from donphan import OPTIONAL_CODECS, create_pool
+
+from ditto.db.scheduler import Recurrence
+from ditto.db.tables import Events
+
+POSTGRES_DSN = os.environ.get("POSTGRES_DSN")
+
+
+def utc(*args: int) -> datetime.datetime:
+    return datetime.datetime(*args, tzinfo=datetime.timezone.utc)
+
+
+class TestDittoRecurrence(TestCase):
+    def test_validation(self) -> None:
+        with self.assertRaises(ValueError):
+            Recurrence()
+        with self.assertRaises(ValueError):
+            Recurrence(interval=datetime.timedelta(0))
+        with self.assertRaises(ValueError):
+            Recurrence(time=datetime.time(9), days=(7,))
+        with self.assertRaises(ValueError):
+            Recurrence(time=datetime.time(9), timezone="Not/AZone")
+        with self.assertRaises(ValueError):
+            Recurrence(time=datetime.time(9, tzinfo=datetime.timezone.utc))
+
+    def test_interval(self) -> None:
+        recurrence = Recurrence(interval=datetime.timedelta(hours=1))
+        previous = utc(2024, 1, 1)
+
+        self.assertEqual(recurrence.next_after(previous, previous), utc(2024, 1, 1, 1))
+        # Missed occurrences are skipped, keeping to the original schedule
+        self.assertEqual(recurrence.next_after(previous, utc(2024, 1, 1, 3, 30)), utc(2024, 1, 1, 4))
+        self.assertEqual(recurrence.next_after(previous, utc(2024, 1, 1, 3)), utc(2024, 1, 1, 4))
+
+    def test_daily_time(self) -> None:
+        recurrence = Recurrence(time=datetime.time(9), days=(0, 2))
+
+        # 2024-01-01 was a Monday
+        self.assertEqual(recurrence.next_after(utc(2024, 1, 1, 9), utc(2024, 1, 1, 9)), utc(2024, 1, 3, 9))
+        self.assertEqual(recurrence.next_after(utc(2024, 1, 3, 9), utc(2024, 1, 3, 12)), utc(2024, 1, 8, 9))
+
+    def test_daylight_saving(self) -> None:
+        recurrence = Recurrence(time=datetime.time(9), timezone="Europe/London")
+
+        # Clocks go forward on 2024-03-31, 09:00 moves from GMT to BST
+        self.assertEqual(recurrence.next_after(utc(2024, 3, 30, 9), utc(2024, 3, 30, 9)), utc(2024, 3, 31, 8))
+        self.assertEqual(recurrence.next_after(utc(2024, 3, 31, 8), utc(2024, 3, 31, 8)), utc(2024, 4, 1, 8))
+
+        # Clocks go back on 2024-10-27, 09:00 moves from BST to GMT
+        self.assertEqual(recurrence.next_after(utc(2024, 10, 26, 8), utc(2024, 10, 26, 8)), utc(2024, 10, 27, 9))
+
+    def test_daylight_saving_transition(self) -> None:
+        recurrence = Recurrence(time=datetime.time(1, 30), timezone="Europe/London")
+
+        # 01:30 is skipped when clocks go forward, and happens twice when they go back, the earlier offset is used
+        self.assertEqual(recurrence.next_after(utc(2024, 3, 30, 1, 30), utc(2024, 3, 30, 1, 30)), utc(2024, 3, 31, 1, 30))
+        self.assertEqual(recurrence.next_after(utc(2024, 10, 26, 0, 30), utc(2024, 10, 26, 0, 30)), utc(2024, 10, 27, 0, 30))
+
+
+@skipUnless(POSTGRES_DSN, "POSTGRES_DSN is not set")
+class TestDittoEventsTable(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.pool = await create_pool(POSTGRES_DSN, OPTIONAL_CODECS)  # type: ignore
+
+    async def asyncTearDown(self) -> None:
+        await self.pool.close()
+
+    async def test_insert_events(self) -> None:
+        now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        records = [
+            (now + datetime.timedelta(minutes=2), "reminder", {"args": [1], "kwargs": {"text": "two"}}),
+            (now + datetime.timedelta(minutes=1), "reminder", {"args": [2], "kwargs": {}}),
+            (now, "timeout", {"args": [], "kwargs": {}}),
+        ]
+
+        async with self.pool.acquire() as connection:
+            transaction = connection.transaction()
+            await transaction.start()
+            try:
+                await Events.migrate(connection)
+                await Events.create(connection)
+
+                ids = await Events.insert_events(connection, records)
+                self.assertEqual(len(ids), len(records))
+
+                rows = await connection.fetch(
+                    f"SELECT id, scheduled_for, event_type, data FROM {Events._name} WHERE id = any($1::int[])", ids
+                )
+                stored = {row["id"]: (row["scheduled_for"], row["event_type"], row["data"]) for row in rows}
+                self.assertEqual([stored[id] for id in ids], records)
+            finally:
+                await transaction.rollback()
@@ -1,7 +1,12 @@
+import asyncio
+import io
 import pathlib
+import tempfile
 from unittest import TestCase
 
-from ditto.utils import collections, files, strings
+from PIL import Image
+
+from ditto.utils import collections, eviction, executors, files, images, metrics, strings
 
 
 class TestDittoCollectionsUtils(TestCase):
@@ -24,6 +29,123 @@ class TestDittoCollectionsUtils(TestCase):
         summary = collections.summarise_list(*list, max_items=3, skip_first=True)
         self.assertEqual(summary, "2, 3, 4 (+6 More)")
 
+    def test_sized_lru_dict(self) -> None:
+        cache = collections.SizedLRUDict[str, bytes](10)
+
+        cache["a"] = b"1234"
+        cache["b"] = b"123"
+        cache["a"]
+        cache["c"] = b"1234"
+        self.assertEqual(list(cache), ["a", "c"])
+        self.assertEqual(cache.size, 8)
+
+        cache["d"] = b"12345678901"
+        self.assertNotIn("d", cache)
+
+        self.assertEqual(cache.pop("a"), b"1234")
+        self.assertEqual(cache.size, 4)
+
+    def test_timer_wheel(self) -> None:
+        wheel = collections.TimerWheel[str](resolution=1, slots=4, levels=2)
+        self.assertIsNone(wheel.next_deadline())
+
+        wheel.add(2, "a")
+        wheel.add(3.5, "b")
+        wheel.add(10, "c")
+        wheel.add(100, "d")
+        self.assertEqual(len(wheel), 4)
+        self.assertEqual(wheel.next_deadline(), 2)
+
+        self.assertEqual(wheel.advance(1.5), [])
+        self.assertEqual(wheel.advance(2), ["a"])
+        self.assertEqual(wheel.advance(3.9), [])
+        self.assertEqual(wheel.advance(4), ["b"])
+        self.assertEqual(wheel.advance(50), ["c"])
+        self.assertEqual(wheel.advance(100), ["d"])
+        self.assertFalse(wheel)
+
+        wheel.add(0, "e")
+        self.assertEqual(wheel.advance(100), ["e"])
+
+        # An item in a higher level is due before one added to the lowest level after it
+        wheel = collections.TimerWheel[str](resolution=1, slots=4, levels=2)
+        wheel.add(4, "f")
+        wheel.advance(2)
+        wheel.add(5, "g")
+        self.assertEqual(wheel.next_deadline(), 4)
+        self.assertEqual(wheel.advance(4), ["f"])
+        self.assertEqual(wheel.next_deadline(), 5)
+
+        wheel = collections.TimerWheel[str]()
+        wheel.add(7.0, "h")
+        wheel.advance(6.0)
+        wheel.add(10.0, "i")
+        self.assertLessEqual(wheel.next_deadline(), 7.0)  # type: ignore
+
+
+class TestDittoEvictionUtils(TestCase):
+    def test_lru_policy(self) -> None:
+        policy = eviction.LRUPolicy[int]()
+        for key in (1, 2, 3):
+            policy.insert(key)
+
+        policy.access(1)
+        self.assertEqual(policy.order(), [2, 3, 1])
+
+        policy.remove(3)
+        self.assertEqual(policy.order(), [2, 1])
+
+    def test_lfu_policy(self) -> None:
+        now = 0.0
+        policy = eviction.LFUPolicy[int](half_life=10, clock=lambda: now)
+        for key in (1, 2, 3):
+            policy.insert(key)
+
+        policy.access(1)
+        policy.access(1)
+        policy.access(3)
+        self.assertEqual(policy.order(), [2, 3, 1])
+
+        # Old uses decay, so a key used since overtakes them
+        now = 30.0
+        policy.access(2)
+        self.assertEqual(policy.order(), [3, 1, 2])
+
+    def test_two_queue_policy(self) -> None:
+        policy = eviction.TwoQueuePolicy[int](probation_ratio=0.25)
+        for key in (1, 2, 3, 4):
+            policy.insert(key)
+            policy.access(key)
+
+        # A scan of keys used once is evicted before the keys used repeatedly
+        for key in (5, 6, 7, 8):
+            policy.insert(key)
+        self.assertEqual(policy.order(), [5, 6, 7, 8, 1, 2, 3, 4])
+
+        # Once probation holds less than its share, the least recently used protected keys go first
+        for key in (9, 10, 11, 12):
+            policy.insert(key)
+            policy.access(key)
+        for key in (5, 6, 7):
+            policy.remove(key)
+        self.assertEqual(policy.order(), [1, 8, 2, 3, 4, 9, 10, 11, 12])
+
+
+class TestDittoExecutorsUtils(TestCase):
+    def test_cpu_executor(self) -> None:
+        async def run(executor: executors.CPUExecutor) -> list[int]:
+            try:
+                return await asyncio.gather(*(executor.run(pow, i, 2) for i in range(8)))
+            finally:
+                executor.shutdown()
+
+        for processes in (False, True):
+            executor = executors.CPUExecutor(2, 1, processes=processes)
+            self.assertEqual(asyncio.run(run(executor)), [i**2 for i in range(8)])
+            self.assertEqual(executor.completed, 8)
+            self.assertEqual(executor.queued, 0)
+            self.assertEqual(executor.run_time.count, 8)
+
 
 class TestDittoFileUtils(TestCase):
     def test_get_base_dir(self) -> None:
@@ -31,6 +153,74 @@ class TestDittoFileUtils(TestCase):
         self.assertIsInstance(base_dir, pathlib.Path)
         self.assertEqual(base_dir, (pathlib.Path(__file__).parent.parent / "ditto").relative_to(pathlib.Path.cwd()))
 
+    def test_disk_cache(self) -> None:
+        async def run(cache: files.DiskCache) -> None:
+            self.assertIsNone(await cache.get("a"))
+
+            await cache.set("a", b"1234")
+            self.assertEqual(await cache.get("a"), b"1234")
+
+            await cache.set("b", b"12345")
+            self.assertIsNone(await cache.get("a"))
+            self.assertEqual(await cache.get("b"), b"12345")
+            self.assertEqual(cache.size, 5)
+
+        with tempfile.TemporaryDirectory() as directory:
+            asyncio.run(run(files.DiskCache(directory, max_size=8)))
+
+            # The index is rebuilt from the files left in the directory
+            cache = files.DiskCache(directory, max_size=8)
+            self.assertEqual(cache.size, 5)
+            self.assertEqual(asyncio.run(cache.get("b")), b"12345")
+
+
+class TestDittoImagesUtils(TestCase):
+    def test_mask_circle(self) -> None:
+        data = images.solid_colour((16, 16), (255, 0, 0))
+        masked = Image.open(io.BytesIO(images.mask_circle(data)))
+
+        self.assertEqual(masked.mode, "RGBA")
+        self.assertEqual(masked.getpixel((8, 8)), (255, 0, 0, 255))
+        self.assertEqual(masked.getpixel((0, 0))[3], 0)
+
+    def test_mask_circle_animated(self) -> None:
+        colours = [(255, 0, 0), (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0)]
+        frames = [Image.new("RGB", (16, 16), colour) for colour in colours]
+        data = io.BytesIO()
+        frames[0].save(data, format="gif", save_all=True, append_images=frames[1:], duration=100, loop=0)
+
+        # The identical first frames are merged, then every other frame is dropped
+        masked = Image.open(io.BytesIO(images.mask_circle_animated(data.getvalue(), max_frames=2)))
+        self.assertEqual(masked.n_frames, 2)
+        self.assertEqual(masked.info["duration"], 300)
+        self.assertEqual(masked.convert("RGBA").getpixel((8, 8)), (255, 0, 0, 255))
+        self.assertEqual(masked.convert("RGBA").getpixel((0, 0))[3], 0)
+
+        with self.assertRaises(ValueError):
+            images.mask_circle_animated(data.getvalue(), max_size=16)
+
+
+class TestDittoMetricsUtils(TestCase):
+    def test_histogram(self) -> None:
+        histogram = metrics.Histogram([1, 2, 4, 8])
+        self.assertEqual(histogram.quantile(0.5), 0)
+
+        for value in (0.5, 1.5, 1.5, 3, 100):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.mean, 21.3)
+        self.assertEqual(list(histogram), [(1, 1), (2, 2), (4, 1), (8, 0), (float("inf"), 1)])
+
+        self.assertEqual(histogram.quantile(0), 0.5)
+        self.assertEqual(histogram.quantile(0.5), 2)
+        self.assertEqual(histogram.quantile(0.8), 4)
+        self.assertEqual(histogram.quantile(1), 100)
+
+        histogram.reset()
+        self.assertEqual(histogram.count, 0)
+        self.assertEqual(list(histogram)[0], (1, 0))
+
 
 class TestDittoStringUtils(TestCase):
     def test_codeblock(self) -> None: